@@ -131,6 +131,14 @@ class Diagnose(commands.Cog):
             emoji = "<:Tick:1446847553365737554>" if passed else "<:Cross:1446847583510331392>"
             description += f"**{check_name}**\n{emoji}\n\n"
         
+        # Session scheduler accuracy
+        scheduler = self.bot.session_handler.scheduler_metrics()
+        description += (
+            f"**Session Scheduler**\n{scheduler['pending_timers']} pending, {scheduler['timers_fired']} fired, "
+            f"{scheduler['average_lateness']:.2f}s late on average (max {scheduler['max_lateness']:.2f}s), "
+            f"{scheduler['fetches_avoided']} message fetches avoided, {scheduler['fetch_fallbacks']} fallbacks\n\n"
+        )
+        
         # Create embed
         embed = discord.Embed(
             title="Bot Diagnoses",
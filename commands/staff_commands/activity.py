@@ -2,7 +2,22 @@ import discord
 from discord.ext import commands
 from discord import app_commands
 from typing import Optional
-from utilities.FirebaseHandler import firebase
+from utilities.Paginator import PaginatorView
+
+
+LEADERBOARD_PAGE_SIZE = 10
+
+METRIC_NAMES = {
+    "total_sessions": "Total Sessions",
+    "total_minutes": "Total Minutes",
+    "total_messages": "Total Messages"
+}
+
+PERIOD_NAMES = {
+    "today": "Today",
+    "week": "This Week",
+    "month": "Last 30 Days"
+}
 
 
 class Activity(commands.Cog):
@@ -10,28 +25,67 @@ class Activity(commands.Cog):
     
     def __init__(self, bot):
         self.bot = bot
+        self.activity_handler = bot.activity_handler
     
     @app_commands.command(name="activity", description="View staff activity statistics")
-    @app_commands.describe(user="The staff member to check (defaults to yourself)")
-    async def activity(self, interaction: discord.Interaction, user: Optional[discord.User] = None):
+    @app_commands.describe(
+        user="The staff member to check (defaults to yourself)",
+        mode="Show a single profile or the leaderboard",
+        metric="The statistic to rank the leaderboard by",
+        period="The time period to show in a profile (defaults to all time)"
+    )
+    @app_commands.choices(
+        mode=[
+            app_commands.Choice(name="Profile", value="profile"),
+            app_commands.Choice(name="Leaderboard", value="leaderboard")
+        ],
+        metric=[
+            app_commands.Choice(name="Sessions", value="total_sessions"),
+            app_commands.Choice(name="Minutes", value="total_minutes"),
+            app_commands.Choice(name="Messages", value="total_messages")
+        ],
+        period=[
+            app_commands.Choice(name="All Time", value="lifetime"),
+            app_commands.Choice(name="Today", value="today"),
+            app_commands.Choice(name="This Week", value="week"),
+            app_commands.Choice(name="Last 30 Days", value="month")
+        ]
+    )
+    async def activity(self, interaction: discord.Interaction, user: Optional[discord.User] = None,
+                       mode: Optional[app_commands.Choice[str]] = None,
+                       metric: Optional[app_commands.Choice[str]] = None,
+                       period: Optional[app_commands.Choice[str]] = None):
         """
-        Display staff activity statistics from Firebase
+        Display staff activity statistics from the activity index
         
         Args:
             interaction: Discord interaction
             user: Optional user to check (defaults to command invoker)
+            mode: Profile (default) or leaderboard
+            metric: Leaderboard metric (defaults to sessions)
+            period: Time period read from the rollup buckets (defaults to all time)
         """
-        # Default to the command invoker if no user specified
-        target_user = user or interaction.user
-        
-        # Defer response in case Firebase takes time
+        # Defer response in case the index has to be loaded from Firebase
         await interaction.response.defer()
         
-        # Fetch all accounts from Firebase
-        accounts = firebase.get("accounts")
+        if mode and mode.value == "leaderboard":
+            # Rankings only cover lifetime totals, so a period would mislabel them
+            if period and period.value in PERIOD_NAMES:
+                embed = discord.Embed(
+                    title="Staff Activity",
+                    description="The leaderboard only ranks all-time totals. Leave out the period or view a profile instead.",
+                    color=discord.Color.red()
+                )
+                await interaction.followup.send(embed=embed)
+                return
+            await self.send_leaderboard(interaction, metric.value if metric else "total_sessions")
+            return
+        
+        # Default to the command invoker if no user specified
+        target_user = user or interaction.user
         
         # Check if accounts data exists
-        if not accounts:
+        if not self.activity_handler.loaded and not await self.activity_handler.load():
             embed = discord.Embed(
                 title="Staff Activity",
                 description=f"No accounts data found in database",
@@ -41,14 +95,10 @@ class Activity(commands.Cog):
             return
         
         # Find the account with matching discord_id
-        user_account = None
-        for account_id, account_data in accounts.items():
-            if account_data.get('discord_id') == str(target_user.id):
-                user_account = account_data
-                break
+        result = await self.activity_handler.get_account(target_user.id)
         
         # Check if user account was found
-        if not user_account:
+        if not result:
             embed = discord.Embed(
                 title="Staff Activity",
                 description=f"No activity data found for **{target_user.name}**\nUser may not be linked to an account.",
@@ -57,10 +107,16 @@ class Activity(commands.Cog):
             await interaction.followup.send(embed=embed)
             return
         
-        # Extract activity statistics
-        total_sessions = user_account.get('total_sessions', 0)
-        total_minutes = user_account.get('total_minutes', 0)
-        total_messages = user_account.get('total_messages', 0)
+        account_id, user_account = result
+        
+        # Extract activity statistics, from the rollup buckets when a period is selected
+        stats = user_account
+        if period and period.value in PERIOD_NAMES:
+            stats = await self.activity_handler.get_period_totals(account_id, period.value)
+        
+        total_sessions = stats.get('total_sessions', 0)
+        total_minutes = stats.get('total_minutes', 0)
+        total_messages = stats.get('total_messages', 0)
         roleplay_name = user_account.get('roleplay_name', 'Unknown')
         
         # Create embed with styling
@@ -89,6 +145,16 @@ class Activity(commands.Cog):
             inline=True
         )
         
+        if stats is not user_account:
+            embed.set_footer(text=f"Showing activity for: {PERIOD_NAMES[period.value]}")
+        
+        # Add leaderboard positions - rankings cover lifetime totals whatever the period
+        ranks = []
+        for metric_key, metric_name in METRIC_NAMES.items():
+            rank = self.activity_handler.get_rank(metric_key, account_id)
+            ranks.append(f"{metric_name}: `#{rank}`" if rank else f"{metric_name}: `N/A`")
+        embed.add_field(name="All-Time Leaderboard Rank", value="\n".join(ranks), inline=False)
+        
         # Set thumbnail to user's avatar
         embed.set_thumbnail(url=target_user.display_avatar.url)
         
@@ -99,8 +165,55 @@ class Activity(commands.Cog):
         
         # Send the embed
         await interaction.followup.send(embed=embed)
+    
+    async def send_leaderboard(self, interaction: discord.Interaction, metric: str):
+        """Send a paginated leaderboard for a metric"""
+        if not self.activity_handler.loaded and not await self.activity_handler.load():
+            embed = discord.Embed(
+                title="Staff Activity",
+                description=f"No accounts data found in database",
+                color=discord.Color.red()
+            )
+            await interaction.followup.send(embed=embed)
+            return
+        
+        ranked_count = self.activity_handler.get_ranked_count(metric)
+        page_count = max((ranked_count + LEADERBOARD_PAGE_SIZE - 1) // LEADERBOARD_PAGE_SIZE, 1)
+        
+        # Look up the invoker's own position once
+        own_account_id = self.activity_handler.get_account_id(interaction.user.id)
+        own_rank = self.activity_handler.get_rank(metric, own_account_id) if own_account_id else None
+        
+        def build_page(page: int) -> discord.Embed:
+            offset = page * LEADERBOARD_PAGE_SIZE
+            entries = self.activity_handler.get_leaderboard(metric, offset, LEADERBOARD_PAGE_SIZE)
+            
+            lines = []
+            for account_id, account_data, value in entries:
+                rank = self.activity_handler.get_rank(metric, account_id)
+                roleplay_name = account_data.get('roleplay_name', 'Unknown')
+                lines.append(f"`#{rank}` <@{account_data.get('discord_id')}> - {roleplay_name} - `{value}`")
+            
+            embed = discord.Embed(
+                title=f"Staff Leaderboard - {METRIC_NAMES[metric]} (All Time)",
+                description="\n".join(lines) if lines else "No activity data found",
+                color=None
+            )
+            embed.add_field(
+                name="Your Rank",
+                value=f"`#{own_rank}` of `{ranked_count}`" if own_rank else "`N/A`",
+                inline=False
+            )
+            embed.set_footer(text=f"Page {page + 1}/{page_count}")
+            embed.set_image(
+                url="https://media.discordapp.net/attachments/1353870922712354900/1437239861802303628/WSALine.png?ex=69132e2d&is=6911dcad&hm=47098d9c927db0fa5a2b9ce7bcc63890bc2ec4042916daebd9d93ce0a6f6e280&=&format=webp&quality=lossless"
+            )
+            return embed
+        
+        view = PaginatorView(interaction.user.id, page_count, build_page)
+        await interaction.followup.send(embed=build_page(0), view=view)
 
 
 async def setup(bot):
     """Add cog to bot"""
-    await bot.add_cog(Activity(bot))
\ No newline at end of file
+    await bot.add_cog(Activity(bot))
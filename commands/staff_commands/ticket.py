@@ -4,12 +4,25 @@ from discord.ext import commands
 from utilities.TicketHandler import (
     create_ticket_channel, 
     is_ticket_channel, 
-    has_staff_permissions
+    has_staff_permissions,
+    update_ticket_topic,
+    is_user_blacklisted,
+    blacklist_user,
+    unblacklist_user,
+    ticket_queue
 )
-from utilities.TranscriptHandler import send_transcript, generate_transcript
+from utilities.TranscriptHandler import close_ticket, generate_transcript
+from utilities.TranscriptIndex import transcript_index
+from utilities.TicketRegistry import ticket_registry
+from utilities.TicketStore import ticket_store, save_ticket
+from utilities.TicketMetrics import ticket_metrics, format_duration, METRICS_HISTORY_DAYS
+from utilities.Paginator import PaginatorView
 import config
 import asyncio
 
+SEARCH_PAGE_SIZE = 5
+SEARCH_MAX_RESULTS = 50
+
 class TicketCommands(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
@@ -61,12 +74,8 @@ class TicketCommands(commands.Cog):
         
         await interaction.followup.send(embed=embed)
         
-        # Generate and send transcript with close reason
-        await send_transcript(interaction.channel, interaction.user, close_reason=close_reason)
-        
-        # Wait and delete channel
-        await asyncio.sleep(3)
-        await interaction.channel.delete(reason=f"Ticket closed by {interaction.user} - {close_reason}")
+        # Send the transcript everywhere at once, then delete the channel
+        await close_ticket(interaction.channel, interaction.user, close_reason=close_reason)
     
     @ticket_group.command(name="add", description="Add a user to the ticket")
     @app_commands.describe(user="The user to add to the ticket")
@@ -199,9 +208,10 @@ class TicketCommands(commands.Cog):
             return
         
         channel = interaction.channel
+        ticket = ticket_registry.get(channel.id) or ticket_registry.register_from_channel(channel)
         
         # Check if already claimed
-        if channel.topic and "Claimed by:" in channel.topic:
+        if ticket['claimed_by']:
             embed = discord.Embed(
                 title="<:Cross:1446847583510331392>  Waterstone Support",
                 description="This ticket has already been claimed!",
@@ -211,10 +221,17 @@ class TicketCommands(commands.Cog):
             await interaction.response.send_message(embed=embed, ephemeral=True)
             return
         
+        # Claim in memory before anything is awaited, so two staff can't both claim
+        ticket_registry.set_claimer(channel.id, interaction.user.name)
+        
         await interaction.response.defer()
         
-        # Update channel topic
-        await channel.edit(topic=f"Claimed by: {interaction.user.name}")
+        record = await save_ticket(
+            ticket_store.claim, channel.id, channel.guild.id, ticket['owner_id'],
+            interaction.user.id, interaction.user.name
+        )
+        ticket_metrics.record_claim(record)
+        update_ticket_topic(channel)
         
         embed = discord.Embed(
             title="<:People:1446847702804598886>  Waterstone Support",
@@ -262,6 +279,10 @@ class TicketCommands(commands.Cog):
         old_name = interaction.channel.name
         await interaction.channel.edit(name=new_channel_name)
         
+        # The owner index is keyed by user, so only make sure this ticket is in it
+        if ticket_registry.get(interaction.channel.id) is None:
+            ticket_registry.register_from_channel(interaction.channel)
+        
         embed = discord.Embed(
             title="<:People:1446847702804598886>  Waterstone Support",
             description=f"Ticket renamed from `{old_name}` to `{new_channel_name}` by {interaction.user.mention}",
@@ -279,5 +300,174 @@ class TicketCommands(commands.Cog):
         success_embed.set_image(url="https://media.discordapp.net/attachments/1353870922712354900/1437239861802303628/WSALine.png?ex=693423ad&is=6932d22d&hm=96f2ac4bdc5294f7109fc750e3225b22e73dfef514ce605c545e6dadb26ebdb4&=&format=webp&quality=lossless")
         await interaction.followup.send(embed=success_embed, ephemeral=True)
 
+    @ticket_group.command(name="search", description="Search closed ticket transcripts")
+    @app_commands.describe(query="Words to search for in names, reasons and messages")
+    async def ticket_search(self, interaction: discord.Interaction, query: str):
+        """Search the closed ticket index"""
+        
+        # Check permissions
+        if not has_staff_permissions(interaction.user):
+            embed = discord.Embed(
+                title="<:Cross:1446847583510331392>  Waterstone Support",
+                description="You don't have permission to search tickets!",
+                color=None
+            )
+            embed.set_image(url="https://media.discordapp.net/attachments/1353870922712354900/1437239861802303628/WSALine.png?ex=693423ad&is=6932d22d&hm=96f2ac4bdc5294f7109fc750e3225b22e73dfef514ce605c545e6dadb26ebdb4&=&format=webp&quality=lossless")
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+            return
+        
+        await interaction.response.defer(ephemeral=True)
+        
+        # Fetch the best matches once and page through them locally
+        results = await asyncio.to_thread(transcript_index.search, query, SEARCH_MAX_RESULTS)
+        page_count = max((len(results) + SEARCH_PAGE_SIZE - 1) // SEARCH_PAGE_SIZE, 1)
+        
+        def build_page(page: int) -> discord.Embed:
+            embed = discord.Embed(
+                title="<:People:1446847702804598886>  Waterstone Support",
+                description=f"Results for `{query}`" if results else f"No closed tickets match `{query}`",
+                color=None
+            )
+            for result in results[page * SEARCH_PAGE_SIZE:(page + 1) * SEARCH_PAGE_SIZE]:
+                link = f"[View transcript]({result['jump_url']})" if result['jump_url'] else "Transcript link unavailable"
+                value = (
+                    f"**Creator**: {result['owner_name']} | **Closed By**: {result['closer_name']} | **Claimed By**: {result['claimed_by']}\n"
+                    f"**Open Reason**: {result['open_reason']}\n"
+                    f"{result['snippet'] or ''}\n{link}"
+                )
+                embed.add_field(name=f"{result['channel_name']} - {result['closed_at']} UTC", value=value[:1024], inline=False)
+            embed.set_footer(text=f"Page {page + 1}/{page_count}")
+            embed.set_image(url="https://media.discordapp.net/attachments/1353870922712354900/1437239861802303628/WSALine.png?ex=693423ad&is=6932d22d&hm=96f2ac4bdc5294f7109fc750e3225b22e73dfef514ce605c545e6dadb26ebdb4&=&format=webp&quality=lossless")
+            return embed
+        
+        view = PaginatorView(interaction.user.id, page_count, build_page)
+        await interaction.followup.send(embed=build_page(0), view=view, ephemeral=True)
+    
+    @ticket_group.command(name="blacklist", description="Stop a user from creating tickets")
+    @app_commands.describe(user="The user to blacklist", reason="Reason for the blacklist")
+    async def ticket_blacklist(self, interaction: discord.Interaction, user: discord.Member, reason: str = None):
+        """Blacklist a user from tickets"""
+        
+        # Check permissions
+        if not has_staff_permissions(interaction.user):
+            embed = discord.Embed(
+                title="<:Cross:1446847583510331392>  Waterstone Support",
+                description="You don't have permission to blacklist users!",
+                color=None
+            )
+            embed.set_image(url="https://media.discordapp.net/attachments/1353870922712354900/1437239861802303628/WSALine.png?ex=693423ad&is=6932d22d&hm=96f2ac4bdc5294f7109fc750e3225b22e73dfef514ce605c545e6dadb26ebdb4&=&format=webp&quality=lossless")
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+            return
+        
+        await interaction.response.defer(ephemeral=True)
+        
+        await blacklist_user(user.id, reason, interaction.user.id)
+        
+        embed = discord.Embed(
+            title="<:People:1446847702804598886>  Waterstone Support",
+            description=f"{user.mention} can no longer create tickets",
+            color=None
+        )
+        embed.add_field(name="Reason", value=reason if reason else "No reason provided", inline=False)
+        embed.set_image(url="https://media.discordapp.net/attachments/1353870922712354900/1437239861802303628/WSALine.png?ex=693423ad&is=6932d22d&hm=96f2ac4bdc5294f7109fc750e3225b22e73dfef514ce605c545e6dadb26ebdb4&=&format=webp&quality=lossless")
+        await interaction.followup.send(embed=embed, ephemeral=True)
+    
+    @ticket_group.command(name="unblacklist", description="Allow a blacklisted user to create tickets again")
+    @app_commands.describe(user="The user to remove from the blacklist")
+    async def ticket_unblacklist(self, interaction: discord.Interaction, user: discord.Member):
+        """Remove a user from the ticket blacklist"""
+        
+        # Check permissions
+        if not has_staff_permissions(interaction.user):
+            embed = discord.Embed(
+                title="<:Cross:1446847583510331392>  Waterstone Support",
+                description="You don't have permission to unblacklist users!",
+                color=None
+            )
+            embed.set_image(url="https://media.discordapp.net/attachments/1353870922712354900/1437239861802303628/WSALine.png?ex=693423ad&is=6932d22d&hm=96f2ac4bdc5294f7109fc750e3225b22e73dfef514ce605c545e6dadb26ebdb4&=&format=webp&quality=lossless")
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+            return
+        
+        if not is_user_blacklisted(user.id):
+            embed = discord.Embed(
+                title="<:Cross:1446847583510331392>  Waterstone Support",
+                description=f"{user.mention} isn't blacklisted!",
+                color=None
+            )
+            embed.set_image(url="https://media.discordapp.net/attachments/1353870922712354900/1437239861802303628/WSALine.png?ex=693423ad&is=6932d22d&hm=96f2ac4bdc5294f7109fc750e3225b22e73dfef514ce605c545e6dadb26ebdb4&=&format=webp&quality=lossless")
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+            return
+        
+        await interaction.response.defer(ephemeral=True)
+        
+        await unblacklist_user(user.id)
+        
+        embed = discord.Embed(
+            title="<:People:1446847702804598886>  Waterstone Support",
+            description=f"{user.mention} can create tickets again",
+            color=None
+        )
+        embed.set_image(url="https://media.discordapp.net/attachments/1353870922712354900/1437239861802303628/WSALine.png?ex=693423ad&is=6932d22d&hm=96f2ac4bdc5294f7109fc750e3225b22e73dfef514ce605c545e6dadb26ebdb4&=&format=webp&quality=lossless")
+        await interaction.followup.send(embed=embed, ephemeral=True)
+    
+    @ticket_group.command(name="stats", description="View ticket response times and backlog")
+    async def ticket_stats(self, interaction: discord.Interaction):
+        """Show the ticket SLA metrics"""
+        
+        # Check permissions
+        if not has_staff_permissions(interaction.user):
+            embed = discord.Embed(
+                title="<:Cross:1446847583510331392>  Waterstone Support",
+                description="You don't have permission to view ticket stats!",
+                color=None
+            )
+            embed.set_image(url="https://media.discordapp.net/attachments/1353870922712354900/1437239861802303628/WSALine.png?ex=693423ad&is=6932d22d&hm=96f2ac4bdc5294f7109fc750e3225b22e73dfef514ce605c545e6dadb26ebdb4&=&format=webp&quality=lossless")
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+            return
+        
+        def describe_percentile(histogram, fraction: float) -> str:
+            bound, overflow = histogram.percentile(fraction)
+            return f"{'over' if overflow else 'under'} {format_duration(bound)}"
+        
+        def describe(histogram) -> str:
+            if not histogram.count:
+                return "No data yet"
+            within_day = histogram.within(24 * 3600)
+            within_two_days = histogram.within(48 * 3600)
+            return (
+                f"**Tickets**: {histogram.count}\n"
+                f"**Average**: {format_duration(histogram.average)}\n"
+                f"**Median**: {describe_percentile(histogram, 0.5)}\n"
+                f"**90th Percentile**: {describe_percentile(histogram, 0.9)}\n"
+                f"**Within 24h**: {within_day:.0%} | **Within 48h**: {within_two_days:.0%}"
+            )
+        
+        queue = ticket_queue.metrics()
+        embed = discord.Embed(
+            title="<:People:1446847702804598886>  Waterstone Support",
+            description=f"Ticket stats since startup, including tickets closed in the last {METRICS_HISTORY_DAYS} days",
+            color=None
+        )
+        embed.add_field(name="Open Tickets", value=str(ticket_metrics.open_tickets), inline=True)
+        embed.add_field(name="Unclaimed", value=str(ticket_metrics.unclaimed_tickets), inline=True)
+        embed.add_field(name="Opened / Closed", value=f"{ticket_metrics.opened} / {ticket_metrics.closed}", inline=True)
+        embed.add_field(name="Time to Claim", value=describe(ticket_metrics.time_to_claim), inline=True)
+        embed.add_field(name="Time to Close", value=describe(ticket_metrics.time_to_close), inline=True)
+        embed.add_field(
+            name="Creation Queue",
+            value=(
+                f"**Waiting**: {queue['queued']}\n"
+                f"**Average Wait**: {queue['average_wait']:.1f}s\n"
+                f"**95th Percentile Wait**: {queue['p95_wait']:.1f}s\n"
+                f"**Longest Wait**: {queue['max_wait']:.1f}s\n"
+                f"**Created**: {queue['processed']} | **Turned Away**: {queue['rejected']}\n"
+                f"**Average Creation**: {queue['average_create']:.2f}s | **Average Welcome**: {queue['average_welcome']:.2f}s\n"
+                f"**Current Interval**: {queue['interval']:.1f}s"
+            ),
+            inline=False
+        )
+        embed.set_image(url="https://media.discordapp.net/attachments/1353870922712354900/1437239861802303628/WSALine.png?ex=693423ad&is=6932d22d&hm=96f2ac4bdc5294f7109fc750e3225b22e73dfef514ce605c545e6dadb26ebdb4&=&format=webp&quality=lossless")
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
 async def setup(bot):
     await bot.add_cog(TicketCommands(bot))
\ No newline at end of file
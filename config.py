@@ -7,6 +7,9 @@ load_dotenv()
 DISCORD_BOT_TOKEN = os.getenv("DISCORD_BOT_TOKEN")
 VERSION = os.getenv("VERSION")
 
+# Local Storage
+DATA_DIR = os.getenv("DATA_DIR", "data")
+
 # API Information
 BLOXLINK_API_KEY = os.getenv("BLOXLINK_API_KEY")
 
@@ -21,8 +24,29 @@ ROBLOX_GROUP_ID = os.getenv("ROBLOX_GROUP_ID")
 
 # Channel Information
 SESSION_CHANNEL_ID = os.getenv("SESSION_CHANNEL_ID")
+SESSION_VOICE_CHANNEL_ID = os.getenv("SESSION_VOICE_CHANNEL_ID")  # Optional, any voice channel counts if unset
 TIMETABLE_CLAIMING_ID = os.getenv("TIMETABLE_CLAIMING_ID")
 TIMETABLE_CHANNEL_ID = os.getenv("TIMETABLE_CHANNEL_ID")
 TICKET_CHANNEL_ID = os.getenv("TICKET_CHANNEL_ID")
 TICKET_TRANSCRIPT_ID = os.getenv("TICKET_TRANSCRIPT_ID")
-TICKET_CATEGORY_ID = os.getenv("TICKET_CATEGORY_ID")
\ No newline at end of file
+TICKET_CATEGORY_ID = os.getenv("TICKET_CATEGORY_ID")
+TICKET_CATEGORY_IDS = os.getenv("TICKET_CATEGORY_IDS")  # Comma separated overflow pool, defaults to TICKET_CATEGORY_ID
+
+# Ticket Options
+TICKET_LIVE_TRANSCRIPTS = os.getenv("TICKET_LIVE_TRANSCRIPTS", "false").lower() == "true"  # Log ticket messages as they arrive
+TICKET_TRANSCRIPT_ARCHIVE = os.getenv("TICKET_TRANSCRIPT_ARCHIVE", "auto").lower()  # "auto" compresses only when too large, "always" always compresses
+TICKET_TRANSCRIPT_COMPRESSION = os.getenv("TICKET_TRANSCRIPT_COMPRESSION", "gzip").lower()  # "gzip" or "zstd" (needs zstandard)
+TICKET_TRANSCRIPT_FORMAT = os.getenv("TICKET_TRANSCRIPT_FORMAT", "text").lower()  # "text" or "html"
+TICKET_ARCHIVE_ATTACHMENTS = os.getenv("TICKET_ARCHIVE_ATTACHMENTS", "false").lower() == "true"  # Download attachments into DATA_DIR/attachments
+TICKET_ATTACHMENT_BYTE_BUDGET_MB = os.getenv("TICKET_ATTACHMENT_BYTE_BUDGET_MB", "200")  # Per ticket
+TICKET_ATTACHMENT_TIME_BUDGET_SECONDS = os.getenv("TICKET_ATTACHMENT_TIME_BUDGET_SECONDS", "60")  # Per ticket
+TICKET_ATTACHMENT_CONCURRENCY = os.getenv("TICKET_ATTACHMENT_CONCURRENCY", "4")
+TICKET_STORE_FIREBASE_MIRROR = os.getenv("TICKET_STORE_FIREBASE_MIRROR", "false").lower() == "true"  # Copy ticket records to Firebase under tickets/
+TICKET_TOPIC_UPDATES = os.getenv("TICKET_TOPIC_UPDATES", "true").lower() == "true"  # Show the claimer in the channel topic
+TICKET_QUEUE_MAX_SIZE = os.getenv("TICKET_QUEUE_MAX_SIZE", "50")  # Tickets waiting to be created before new ones are turned away
+TICKET_CREATE_INTERVAL_SECONDS = os.getenv("TICKET_CREATE_INTERVAL_SECONDS", "1")  # Minimum gap between channel creations
+TICKET_USER_BURST = os.getenv("TICKET_USER_BURST", "3")  # Tickets a user can open back to back
+TICKET_USER_REFILL_SECONDS = os.getenv("TICKET_USER_REFILL_SECONDS", "600")  # Time for one more ticket to become available
+TICKET_AUTO_CLOSE = os.getenv("TICKET_AUTO_CLOSE", "false").lower() == "true"  # Warn about and close inactive tickets
+TICKET_INACTIVITY_WARN_HOURS = os.getenv("TICKET_INACTIVITY_WARN_HOURS", "24")
+TICKET_INACTIVITY_CLOSE_HOURS = os.getenv("TICKET_INACTIVITY_CLOSE_HOURS", "48")
\ No newline at end of file
@@ -5,7 +5,22 @@ import os
 import asyncio
 from utilities.TimetableHandler import setup as timetable_setup, handle_timetable_message
 from utilities.TicketHandler import setup_ticket_handler
+from utilities.TranscriptHandler import (
+    start_live_logs,
+    flush_live_logs,
+    record_live_message,
+    record_live_edit,
+    record_live_delete,
+    discard_live_log
+)
+from utilities.TicketRegistry import ticket_registry
+from utilities.TicketStore import ticket_store, save_ticket
+from utilities.SessionStore import session_store
+from utilities.TranscriptIndex import transcript_index
+from utilities.TicketMetrics import ticket_metrics
+from utilities.TicketSweeper import ticket_sweeper
 from utilities.SessionHandler import SessionHandler
+from utilities.ActivityHandler import ActivityHandler
 
 intents = discord.Intents.default()
 intents.guilds = True
@@ -18,6 +33,9 @@ status_index = 0
 # Initialize SessionHandler
 bot.session_handler = SessionHandler(bot)
 
+# Initialize ActivityHandler
+bot.activity_handler = ActivityHandler(bot)
+
 @bot.event
 async def on_ready():
     # Initialize the timetable handler
@@ -28,8 +46,21 @@ async def on_ready():
     setup_ticket_handler(bot)
     print('Ticket handler initialized')
     
+    # Pick up live ticket logs and append anything sent while offline
+    start_live_logs(bot)
+    
+    # Close tickets nobody has replied to
+    ticket_sweeper.start(bot)
+    
+    # Start the session scheduler
+    bot.session_handler.start_task()
     print('Session handler initialized')
     
+    # Build the activity ranking index once
+    await bot.activity_handler.load()
+    bot.activity_handler.start_task()
+    print('Activity handler initialized')
+    
     # Sync slash commands globally
     try:
         synced = await bot.tree.sync()
@@ -45,9 +76,42 @@ async def on_message(message):
     # Handle timetable claiming messages
     await handle_timetable_message(bot, message)
     
+    # Count the message towards staff activity
+    bot.activity_handler.record_message(message)
+    
+    # Append ticket messages to their live transcript log
+    record_live_message(message)
+    
+    # Push back the ticket's inactivity deadline
+    ticket_sweeper.record_message(message)
+    
     # Process other commands
     await bot.process_commands(message)
 
+@bot.event
+async def on_raw_message_edit(payload):
+    record_live_edit(payload)
+
+@bot.event
+async def on_raw_message_delete(payload):
+    record_live_delete(payload.channel_id, payload.message_id)
+
+@bot.event
+async def on_guild_channel_delete(channel):
+    # Forget deleted tickets, however they were deleted
+    ticket_sweeper.forget(channel.id)
+    discard_live_log(channel.id)
+    ticket = ticket_registry.get(channel.id)
+    if ticket is not None:
+        ticket_registry.remove(channel.id)
+        record = await save_ticket(ticket_store.close, channel.id, None, "Channel deleted")
+        ticket_metrics.record_close(record, bool(ticket['claimed_by']))
+
+@bot.event
+async def on_voice_state_update(member, before, after):
+    # Track session attendance
+    bot.session_handler.handle_voice_state_update(member, before, after)
+
 @tasks.loop(seconds=10)
 async def rotate_status():
     global status_index
@@ -90,7 +154,14 @@ async def load_extensions():
 async def main():
     async with bot:
         await load_extensions()
-        await bot.start(config.DISCORD_BOT_TOKEN)
+        try:
+            await bot.start(config.DISCORD_BOT_TOKEN)
+        finally:
+            # Write any buffered activity counters and ticket log entries before exiting
+            await bot.activity_handler.shutdown()
+            await flush_live_logs()
+            for store in (ticket_store, session_store, transcript_index):
+                store.close_connection()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,361 @@
+"""
+Activity Handler Module
+Keeps an in-memory copy of staff account counters and per-metric rankings
+"""
+
+import asyncio
+from bisect import bisect_left, insort
+from datetime import datetime, date, timedelta
+from discord.ext import tasks
+from typing import Optional, Dict, List, Tuple
+from utilities.FirebaseHandler import firebase
+
+
+# Account counters that can be ranked on the leaderboard
+METRICS = ("total_sessions", "total_minutes", "total_messages")
+
+# Buffered counter deltas are written every N seconds or every N events, whichever comes first
+FLUSH_INTERVAL_SECONDS = 60
+FLUSH_EVENT_THRESHOLD = 500
+SHUTDOWN_FLUSH_TIMEOUT = 10
+
+# Daily rollup buckets older than this are deleted, weekly buckets are kept
+DAILY_ROLLUP_RETENTION_DAYS = 35
+ROLLUP_COMPACTION_CATCHUP_DAYS = 7
+
+# Periods that can be read from the rollup buckets
+PERIODS = ("today", "week", "month")
+
+
+def day_key(when: Optional[datetime] = None) -> str:
+    """Get the daily rollup bucket key for a UTC datetime"""
+    return (when or datetime.utcnow()).strftime('%Y-%m-%d')
+
+
+def week_key(day: str) -> str:
+    """Get the ISO week rollup bucket key for a daily bucket key"""
+    year, week, _ = date.fromisoformat(day).isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+class RankingIndex:
+    """Descending ranking of account IDs for a single metric, kept as a sorted array"""
+    
+    def __init__(self):
+        self._keys: List[Tuple[int, str]] = []  # sorted [(-value, account_id)]
+        self._values: Dict[str, int] = {}  # account_id: value
+    
+    def __len__(self) -> int:
+        return len(self._keys)
+    
+    def set(self, account_id: str, value: int):
+        """Insert or move an account to its new position"""
+        old_value = self._values.get(account_id)
+        if old_value == value:
+            return
+        if old_value is not None:
+            del self._keys[bisect_left(self._keys, (-old_value, account_id))]
+        
+        self._values[account_id] = value
+        insort(self._keys, (-value, account_id))
+    
+    def remove(self, account_id: str):
+        """Remove an account from the ranking"""
+        old_value = self._values.pop(account_id, None)
+        if old_value is not None:
+            del self._keys[bisect_left(self._keys, (-old_value, account_id))]
+    
+    def rank(self, account_id: str) -> Optional[int]:
+        """Get the 1-based rank of an account (tied values share a rank)"""
+        value = self._values.get(account_id)
+        if value is None:
+            return None
+        return bisect_left(self._keys, (-value,)) + 1
+    
+    def top(self, offset: int = 0, limit: int = 10) -> List[Tuple[str, int]]:
+        """Get a slice of the ranking as [(account_id, value)]"""
+        return [(account_id, -key) for key, account_id in self._keys[offset:offset + limit]]
+
+
+class ActivityHandler:
+    """Caches staff accounts once and keeps rankings updated as counters change"""
+    
+    def __init__(self, bot):
+        self.bot = bot
+        self.accounts: Dict[str, dict] = {}  # account_id: account_data
+        self.account_ids: Dict[str, str] = {}  # discord_id: account_id
+        self.rankings: Dict[str, RankingIndex] = {metric: RankingIndex() for metric in METRICS}
+        self.loaded = False
+        self._load_lock = asyncio.Lock()
+        self.pending: Dict[Tuple[str, str, str], int] = {}  # (account_id, metric, day): delta
+        self._compacted_through: Optional[date] = None
+        self._pending_events = 0
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._task_started = False
+    
+    def start_task(self):
+        """Start the periodic flush - call this after bot is ready"""
+        if not self._task_started:
+            self.flush_loop.start()
+            self._task_started = True
+    
+    async def load(self, force: bool = False) -> bool:
+        """Download all accounts once and build the ranking index"""
+        async with self._load_lock:
+            if self.loaded and not force:
+                return True
+            
+            accounts = await asyncio.to_thread(firebase.get, "accounts")
+            if not isinstance(accounts, dict):
+                print("Failed to load accounts for activity index")
+                return False
+            
+            self.accounts.clear()
+            self.account_ids.clear()
+            self.rankings = {metric: RankingIndex() for metric in METRICS}
+            
+            for account_id, account_data in accounts.items():
+                if isinstance(account_data, dict):
+                    self._index_account(account_id, account_data)
+            
+            self.loaded = True
+            print(f"Activity index built for {len(self.account_ids)} account(s)")
+            return True
+    
+    def _index_account(self, account_id: str, account_data: dict):
+        """Add or refresh a single account in the cache and rankings"""
+        old_data = self.accounts.get(account_id)
+        if old_data and old_data.get('discord_id') and old_data.get('discord_id') != account_data.get('discord_id'):
+            self.account_ids.pop(old_data['discord_id'], None)
+        
+        self.accounts[account_id] = account_data
+        discord_id = account_data.get('discord_id')
+        if not discord_id:
+            for ranking in self.rankings.values():
+                ranking.remove(account_id)
+            return
+        
+        self.account_ids[str(discord_id)] = account_id
+        for metric, ranking in self.rankings.items():
+            ranking.set(account_id, int(account_data.get(metric, 0) or 0))
+    
+    async def get_account(self, discord_id) -> Optional[Tuple[str, dict]]:
+        """Get (account_id, account_data) for a Discord user"""
+        if not self.loaded:
+            await self.load()
+        
+        account_id = self.account_ids.get(str(discord_id))
+        if account_id:
+            return account_id, self.accounts[account_id]
+        
+        # Pick up accounts linked after the index was built with a single keyed query
+        result = await asyncio.to_thread(
+            firebase.query, "accounts", order_by="discord_id", equal_to=str(discord_id)
+        )
+        if isinstance(result, dict):
+            for account_id, account_data in result.items():
+                if isinstance(account_data, dict):
+                    self._index_account(account_id, account_data)
+                    return account_id, account_data
+        return None
+    
+    def get_account_id(self, discord_id) -> Optional[str]:
+        """Get the cached account ID for a Discord user without any network I/O"""
+        return self.account_ids.get(str(discord_id))
+    
+    def apply_delta(self, account_id: str, metric: str, amount: int):
+        """Apply a counter change to the cached account and its ranking"""
+        account_data = self.accounts.get(account_id)
+        if account_data is None:
+            return
+        
+        account_data[metric] = int(account_data.get(metric, 0) or 0) + amount
+        if account_data.get('discord_id') and metric in self.rankings:
+            self.rankings[metric].set(account_id, account_data[metric])
+    
+    def get_rank(self, metric: str, account_id: str) -> Optional[int]:
+        """Get an account's rank for a metric"""
+        return self.rankings[metric].rank(account_id)
+    
+    def get_leaderboard(self, metric: str, offset: int = 0, limit: int = 10) -> List[Tuple[str, dict, int]]:
+        """Get a page of the leaderboard as [(account_id, account_data, value)]"""
+        return [
+            (account_id, self.accounts[account_id], value)
+            for account_id, value in self.rankings[metric].top(offset, limit)
+        ]
+    
+    def get_ranked_count(self, metric: str) -> int:
+        """Get the number of ranked accounts for a metric"""
+        return len(self.rankings[metric])
+    
+    def record_message(self, message):
+        """Count a message towards its author's total_messages without any network I/O"""
+        if message.author.bot or message.guild is None:
+            return
+        
+        account_id = self.account_ids.get(str(message.author.id))
+        if not account_id:
+            return
+        
+        self.add_delta(account_id, "total_messages", 1)
+    
+    def add_delta(self, account_id: str, metric: str, amount: int):
+        """Buffer a counter change and apply it to the cached account straight away"""
+        key = (account_id, metric, day_key())
+        self.pending[key] = self.pending.get(key, 0) + amount
+        self.apply_delta(account_id, metric, amount)
+        
+        self._pending_events += 1
+        if self._pending_events >= FLUSH_EVENT_THRESHOLD and (self._flush_task is None or self._flush_task.done()):
+            self._flush_task = asyncio.create_task(self.flush())
+    
+    @staticmethod
+    def _daily_buckets(deltas: Dict[Tuple[str, str, str], int]) -> set:
+        """Get the (account_id, day) daily buckets a set of deltas increments - buckets past retention
+        are being deleted, so late deltas only reach the totals and weekly rollups"""
+        expired_through = (datetime.utcnow().date() - timedelta(days=DAILY_ROLLUP_RETENTION_DAYS)).isoformat()
+        return {
+            (account_id, day) for (account_id, _, day), amount in deltas.items()
+            if amount and day > expired_through
+        }
+    
+    def _build_updates(self, deltas: Dict[Tuple[str, str, str], int]) -> dict:
+        """Build a multi-path update incrementing the lifetime totals and their daily/weekly rollups"""
+        daily_buckets = self._daily_buckets(deltas)
+        increments: Dict[str, int] = {}
+        for (account_id, metric, day), amount in deltas.items():
+            if not amount:
+                continue
+            paths = [
+                f"accounts/{account_id}/{metric}",
+                f"activity_rollups/{account_id}/weekly/{week_key(day)}/{metric}"
+            ]
+            if (account_id, day) in daily_buckets:
+                paths.append(f"activity_rollups/{account_id}/daily/{day}/{metric}")
+            for path in paths:
+                increments[path] = increments.get(path, 0) + amount
+        
+        return {path: {".sv": {"increment": amount}} for path, amount in increments.items()}
+    
+    def _expired_rollup_updates(self, deltas: Dict[Tuple[str, str, str], int]) -> Tuple[dict, date]:
+        """Build deletes for daily buckets that aged out since the last compaction - only the first
+        flush of each day has any, and a bucket the same update increments is never deleted, since
+        Firebase rejects an update where one path is inside another"""
+        cutoff = datetime.utcnow().date() - timedelta(days=DAILY_ROLLUP_RETENTION_DAYS)
+        if self._compacted_through == cutoff:
+            return {}, cutoff
+        
+        incremented = self._daily_buckets(deltas)
+        day = self._compacted_through or cutoff - timedelta(days=ROLLUP_COMPACTION_CATCHUP_DAYS)
+        
+        updates = {}
+        while day < cutoff:
+            day += timedelta(days=1)
+            for account_id in self.account_ids.values():
+                if (account_id, day.isoformat()) not in incremented:
+                    updates[f"activity_rollups/{account_id}/daily/{day.isoformat()}"] = None
+        return updates, cutoff
+    
+    async def commit(self, deltas: Dict[Tuple[str, str, str], int], extra_updates: Optional[dict] = None) -> bool:
+        """Write a set of counter deltas in one batched request"""
+        updates = self._build_updates(deltas)
+        if extra_updates:
+            updates.update(extra_updates)
+        if not updates:
+            return True
+        return await asyncio.to_thread(firebase.update, "", updates)
+    
+    async def record_attendance(self, minutes_by_member: Dict[int, int]) -> bool:
+        """Add one session and the attended minutes for each member in one batched write"""
+        day = day_key()
+        deltas = {}
+        for member_id, minutes in minutes_by_member.items():
+            account_id = self.account_ids.get(str(member_id))
+            if not account_id or minutes <= 0:
+                continue
+            deltas[(account_id, "total_sessions", day)] = 1
+            deltas[(account_id, "total_minutes", day)] = minutes
+        
+        for (account_id, metric, _), amount in deltas.items():
+            self.apply_delta(account_id, metric, amount)
+        
+        if await self.commit(deltas):
+            return True
+        
+        # Leave the deltas for the periodic flush to retry
+        print(f"Failed to write attendance for {len(deltas) // 2} member(s), retrying next flush")
+        for key, amount in deltas.items():
+            self.pending[key] = self.pending.get(key, 0) + amount
+        return False
+    
+    async def flush(self) -> bool:
+        """Write all buffered deltas, keeping them for the next flush if the write fails"""
+        async with self._flush_lock:
+            batch, self.pending = self.pending, {}
+            expired_updates, cutoff = self._expired_rollup_updates(batch) if self.loaded else ({}, None)
+            if not batch and not expired_updates:
+                if cutoff:
+                    self._compacted_through = cutoff
+                return True
+            
+            self._pending_events = 0
+            
+            if await self.commit(batch, expired_updates):
+                if cutoff:
+                    self._compacted_through = cutoff
+                return True
+            
+            print(f"Failed to flush {len(batch)} activity counter(s), retrying next flush")
+            for key, amount in batch.items():
+                self.pending[key] = self.pending.get(key, 0) + amount
+            return False
+    
+    @tasks.loop(seconds=FLUSH_INTERVAL_SECONDS)
+    async def flush_loop(self):
+        """Periodically flush buffered counters"""
+        await self.flush()
+    
+    async def shutdown(self):
+        """Stop the flush loop and write what is left, bounded by a timeout"""
+        if self._task_started:
+            self.flush_loop.cancel()
+            self._task_started = False
+        
+        try:
+            await asyncio.wait_for(self.flush(), timeout=SHUTDOWN_FLUSH_TIMEOUT)
+        except asyncio.TimeoutError:
+            print(f"Timed out flushing activity counters, {len(self.pending)} counter(s) lost")
+    
+    async def get_period_totals(self, account_id: str, period: str) -> Dict[str, int]:
+        """Sum an account's rollup buckets for a period, including unflushed deltas"""
+        today = day_key()
+        
+        if period == "today":
+            bucket = await asyncio.to_thread(firebase.get, f"activity_rollups/{account_id}/daily/{today}")
+            buckets = [bucket]
+            in_period = lambda day: day == today
+        elif period == "week":
+            current_week = week_key(today)
+            bucket = await asyncio.to_thread(firebase.get, f"activity_rollups/{account_id}/weekly/{current_week}")
+            buckets = [bucket]
+            in_period = lambda day: week_key(day) == current_week
+        else:
+            first_day = (datetime.utcnow().date() - timedelta(days=29)).isoformat()
+            result = await asyncio.to_thread(
+                firebase.query, f"activity_rollups/{account_id}/daily", order_by="$key", start_at=first_day
+            )
+            buckets = list(result.values()) if isinstance(result, dict) else []
+            in_period = lambda day: day >= first_day
+        
+        totals = {metric: 0 for metric in METRICS}
+        for bucket in buckets:
+            if isinstance(bucket, dict):
+                for metric in METRICS:
+                    totals[metric] += int(bucket.get(metric, 0) or 0)
+        
+        for (pending_account_id, metric, day), amount in self.pending.items():
+            if pending_account_id == account_id and in_period(day):
+                totals[metric] += amount
+        
+        return totals
@@ -0,0 +1,147 @@
+"""
+Attachment Archiver Module
+Downloads ticket attachments into a content-addressed local store and bundles them for upload
+"""
+
+import aiohttp
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import zipfile
+from typing import Dict, List, Optional
+import config
+
+ATTACHMENT_STORE_DIR = os.path.join(config.DATA_DIR, "attachments")
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+BUNDLE_SPOOL_MAX_SIZE = 4 * 1024 * 1024
+
+
+def _store_path(sha256: str) -> str:
+    """Get the content-addressed path for a hash"""
+    return os.path.join(ATTACHMENT_STORE_DIR, sha256[:2], sha256)
+
+
+class AttachmentArchiver:
+    """Archives one ticket's attachments within a byte and time budget"""
+    
+    def __init__(self):
+        self.byte_budget = int(config.TICKET_ATTACHMENT_BYTE_BUDGET_MB) * 1024 * 1024
+        self.time_budget = float(config.TICKET_ATTACHMENT_TIME_BUDGET_SECONDS)
+        self.manifest: List[dict] = []
+        self.archived: Dict[str, dict] = {}  # sha256: manifest entry of the first copy
+        self._semaphore = asyncio.Semaphore(int(config.TICKET_ATTACHMENT_CONCURRENCY))
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._bytes_reserved = 0
+        self._deadline = None
+    
+    def _time_left(self) -> float:
+        loop = asyncio.get_running_loop()
+        if self._deadline is None:
+            self._deadline = loop.time() + self.time_budget
+        return self._deadline - loop.time()
+    
+    async def archive(self, records: List[dict]):
+        """Download the attachments of a batch of records, filling in each attachment's sha256"""
+        entries = []
+        for record in records:
+            for attachment in record['attachments']:
+                if isinstance(attachment, dict):
+                    entry = dict(attachment, message_id=record['id'], status="pending")
+                    self.manifest.append(entry)
+                    entries.append((attachment, entry))
+        
+        if not entries:
+            return
+        
+        time_left = self._time_left()
+        if time_left <= 0:
+            for _, entry in entries:
+                entry['status'] = "skipped (time budget)"
+            return
+        
+        if self._session is None:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.time_budget))
+        
+        tasks = [asyncio.create_task(self._download(attachment, entry)) for attachment, entry in entries]
+        done, pending = await asyncio.wait(tasks, timeout=time_left)
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+        
+        for _, entry in entries:
+            if entry['status'] == "pending":
+                entry['status'] = "skipped (time budget)"
+    
+    async def _download(self, attachment: dict, entry: dict):
+        """Stream one attachment to disk while hashing it"""
+        async with self._semaphore:
+            size = attachment.get('size') or 0
+            if self._bytes_reserved + size > self.byte_budget:
+                entry['status'] = "skipped (byte budget)"
+                return
+            self._bytes_reserved += size
+            
+            os.makedirs(ATTACHMENT_STORE_DIR, exist_ok=True)
+            temp_file = tempfile.NamedTemporaryFile(dir=ATTACHMENT_STORE_DIR, suffix=".part", delete=False)
+            digest = hashlib.sha256()
+            written = 0
+            stored = False
+            try:
+                async with self._session.get(attachment['url']) as resp:
+                    resp.raise_for_status()
+                    async for chunk in resp.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                        written += len(chunk)
+                        # Don't trust the reported size past the budget
+                        if written > size and self._bytes_reserved - size + written > self.byte_budget:
+                            entry['status'] = "skipped (byte budget)"
+                            return
+                        digest.update(chunk)
+                        # Disk writes run in a worker thread so big downloads don't stall the gateway
+                        await asyncio.to_thread(temp_file.write, chunk)
+                await asyncio.to_thread(temp_file.close)
+                
+                sha256 = digest.hexdigest()
+                path = _store_path(sha256)
+                if os.path.exists(path):
+                    # Already stored by this or an earlier ticket
+                    os.remove(temp_file.name)
+                else:
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    os.replace(temp_file.name, path)
+                
+                attachment['sha256'] = sha256
+                entry['sha256'] = sha256
+                entry['status'] = "archived"
+                self.archived.setdefault(sha256, entry)
+                stored = True
+            except asyncio.CancelledError:
+                entry['status'] = "skipped (time budget)"
+                raise
+            except Exception as e:
+                entry['status'] = f"failed ({e.__class__.__name__})"
+            finally:
+                # Keep what was stored against the budget and give back every other reservation
+                self._bytes_reserved += (written if stored else 0) - size
+                if not temp_file.closed:
+                    temp_file.close()
+                if os.path.exists(temp_file.name):
+                    os.remove(temp_file.name)
+    
+    def build_bundle(self):
+        """Zip the archived files and a manifest into a spool - runs in a worker thread"""
+        spool = tempfile.SpooledTemporaryFile(max_size=BUNDLE_SPOOL_MAX_SIZE, mode='w+b')
+        # Media is already compressed, so files are stored as-is
+        with zipfile.ZipFile(spool, 'w', compression=zipfile.ZIP_STORED) as bundle:
+            for sha256, entry in self.archived.items():
+                bundle.write(_store_path(sha256), f"{sha256[:12]}-{entry['filename']}")
+            bundle.writestr("manifest.json", json.dumps(self.manifest, indent=2))
+        spool.seek(0, os.SEEK_END)
+        return spool
+    
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
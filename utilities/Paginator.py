@@ -0,0 +1,39 @@
+import discord
+from discord.ui import View
+
+
+class PaginatorView(View):
+    """Previous/Next buttons for an embed built one page at a time"""
+    
+    def __init__(self, author_id: int, page_count: int, build_page, timeout: float = 180):
+        super().__init__(timeout=timeout)
+        self.author_id = author_id
+        self.page_count = max(page_count, 1)
+        self.build_page = build_page  # callable(page) -> discord.Embed
+        self.page = 0
+        self._update_buttons()
+    
+    def _update_buttons(self):
+        """Enable or disable the buttons for the current page"""
+        self.previous_button.disabled = self.page <= 0
+        self.next_button.disabled = self.page >= self.page_count - 1
+    
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        """Only the user who ran the command can turn pages"""
+        if interaction.user.id != self.author_id:
+            await interaction.response.send_message("These buttons aren't for you!", ephemeral=True)
+            return False
+        return True
+    
+    async def _show_page(self, interaction: discord.Interaction, page: int):
+        self.page = max(0, min(page, self.page_count - 1))
+        self._update_buttons()
+        await interaction.response.edit_message(embed=self.build_page(self.page), view=self)
+    
+    @discord.ui.button(label='Previous', style=discord.ButtonStyle.gray)
+    async def previous_button(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self._show_page(interaction, self.page - 1)
+    
+    @discord.ui.button(label='Next', style=discord.ButtonStyle.gray)
+    async def next_button(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self._show_page(interaction, self.page + 1)
@@ -1,27 +1,89 @@
 import discord
-from discord.ext import tasks
-from datetime import datetime, timedelta
-from typing import Optional, Dict
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Dict, List, Tuple
 import config
 import asyncio
+import heapq
+import itertools
+import time
+from utilities.SessionStore import session_store, save_session
+
+# Recent timer lateness samples kept for the metrics
+LATENESS_WINDOW = 100
 
 class SessionHandler:
     def __init__(self, bot):
         self.bot = bot
         self.active_sessions: Dict[int, dict] = {}  # guild_id: session_data
         self.scheduled_sessions: Dict[int, list] = {}  # guild_id: [session_data]
-        self._task_started = False
-        
+        self.attendance: Dict[int, Dict[int, list]] = {}  # guild_id: {member_id: [seconds_attended, joined_at]}
+        self._timers: List[Tuple[datetime, int, str, int, int]] = []  # (due, seq, kind, guild_id, key)
+        self._timer_seq = itertools.count()
+        self._rearm = asyncio.Event()
+        self._task = None
+        self.lateness = deque(maxlen=LATENESS_WINDOW)  # Seconds each timer fired after its due time
+        self.timers_fired = 0
+        self._rehydrated = False
+        self._background_tasks = set()  # Keeps background writes alive until they finish
+        self._announcements: Dict[int, discord.PartialMessage] = {}  # guild_id: active session announcement
+        self.fetches_avoided = 0
+        self.fetch_fallbacks = 0
+    
     def start_task(self):
-        """Start the background task - call this after bot is ready"""
-        if not self._task_started:
-            self.check_sessions.start()
-            self._task_started = True
-        
+        """Start the scheduler - call this after bot is ready"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run_scheduler())
+    
     def cog_unload(self):
-        if self._task_started:
-            self.check_sessions.cancel()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+    
+    def _arm(self, due: datetime, kind: str, guild_id: int, key: int):
+        """Add a timer and wake the scheduler so it can sleep until the earliest one"""
+        heapq.heappush(self._timers, (due, next(self._timer_seq), kind, guild_id, key))
+        self._rearm.set()
+    
+    def scheduler_metrics(self) -> dict:
+        """How late timers have fired, over the recent window"""
+        samples = list(self.lateness)
+        return {
+            'pending_timers': len(self._timers),
+            'timers_fired': self.timers_fired,
+            'average_lateness': sum(samples) / len(samples) if samples else 0.0,
+            'max_lateness': max(samples) if samples else 0.0,
+            'fetches_avoided': self.fetches_avoided,
+            'fetch_fallbacks': self.fetch_fallbacks
+        }
+    
+    def _keep_announcement(self, guild_id: int, channel, message_id: int):
+        """Keep a handle to a session announcement so it can be edited without fetching it first"""
+        self._announcements[guild_id] = channel.get_partial_message(message_id)
+    
+    async def _edit_announcement(self, guild_id: int, session_data: dict, embed: discord.Embed):
+        """Edit a session announcement in one request, fetching it only if editing the handle fails"""
+        message = self._announcements.pop(guild_id, None)
+        if message is None or message.id != session_data['message_id']:
+            session_channel = self.bot.get_channel(int(config.SESSION_CHANNEL_ID))
+            if not session_channel or not session_data['message_id']:
+                return
+            message = session_channel.get_partial_message(session_data['message_id'])
         
+        try:
+            await message.edit(embed=embed)
+            self.fetches_avoided += 1
+            return
+        except discord.NotFound:
+            # The announcement was deleted, so fetching it would fail too
+            raise
+        except discord.HTTPException as e:
+            print(f"Editing session announcement failed, fetching it instead: {e}")
+        
+        self.fetch_fallbacks += 1
+        message = await message.channel.fetch_message(message.id)
+        await message.edit(embed=embed)
+    
     async def start_session(self, interaction: discord.Interaction, host: discord.Member, 
                           start_time: datetime, end_time: datetime) -> bool:
         """Start a new session with specified start and end times"""
@@ -30,12 +92,12 @@ class SessionHandler:
         # Check if there's already an active session
         if guild_id in self.active_sessions:
             return False
-            
+        
         # Get session channel
         session_channel = self.bot.get_channel(int(config.SESSION_CHANNEL_ID))
         if not session_channel:
             return False
-            
+        
         # Create session data
         session_data = {
             'host': host,
@@ -58,9 +120,13 @@ class SessionHandler:
         # Send session message with @everyone ping
         message = await session_channel.send(content="@everyone", embed=embed)
         session_data['message_id'] = message.id
+        self._keep_announcement(guild_id, session_channel, message.id)
         
         # Store session
         self.active_sessions[guild_id] = session_data
+        self._begin_attendance(interaction.guild)
+        self._arm(end_time, 'end', guild_id, message.id)
+        await save_session(session_store.save_active, guild_id, host.id, start_time, end_time, message.id)
         
         return True
     
@@ -100,54 +166,155 @@ class SessionHandler:
             
             # Add to scheduled sessions
             self.scheduled_sessions[guild_id].append(session_data)
+            self._arm(start_time, 'start', guild_id, event.id)
+            await save_session(
+                session_store.save_scheduled, event.id, guild_id, host.id, start_time, end_time, session_data['title']
+            )
             
             return event
-            
+        
         except Exception as e:
             print(f"Error scheduling session: {e}")
             return None
     
-    @tasks.loop(seconds=30)
-    async def check_sessions(self):
-        """Check for sessions that need to end or start"""
-        now = datetime.utcnow()
+    async def _run_scheduler(self):
+        """Sleep until the next session start or end is due, then run it"""
+        await self.bot.wait_until_ready()
+        try:
+            await self._rehydrate()
+        except Exception as e:
+            print(f"Error restoring sessions: {e}")
         
-        # Check active sessions for ending
-        guilds_to_end = []
-        for guild_id, session_data in self.active_sessions.items():
-            if now >= session_data['end_time']:
-                guilds_to_end.append(guild_id)
+        while True:
+            self._rearm.clear()
+            if not self._timers:
+                await self._rearm.wait()
+                continue
+            
+            delay = (self._timers[0][0] - datetime.utcnow()).total_seconds()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._rearm.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            
+            due, _, kind, guild_id, key = heapq.heappop(self._timers)
+            try:
+                await self._fire_timer(due, kind, guild_id, key)
+            except Exception as e:
+                print(f"Error running session timer: {e}")
+    
+    async def _rehydrate(self):
+        """Restore stored sessions and re-arm their timers, checking scheduled sessions against
+        each guild's server events in one fetch - only the first call counts, so a restarted scheduler
+        doesn't restore sessions twice"""
+        if self._rehydrated:
+            return
+        self._rehydrated = True
+        active, scheduled = await asyncio.to_thread(session_store.load)
+        now = datetime.utcnow()
         
-        # End sessions that have reached their end time
-        for guild_id in guilds_to_end:
-            await self._auto_end_session(guild_id)
+        for session_data in active:
+            guild = self.bot.get_guild(session_data['guild_id'])
+            if not guild or guild.id in self.active_sessions:
+                continue
+            session_data.update(host=guild.get_member(session_data['host_id']), status='active')
+            self.active_sessions[guild.id] = session_data
+            session_channel = self.bot.get_channel(int(config.SESSION_CHANNEL_ID))
+            if session_channel:
+                self._keep_announcement(guild.id, session_channel, session_data['message_id'])
+            # Attendance from before the restart is lost, so count whoever is in voice now
+            self._begin_attendance(guild)
+            # An overdue end fires straight away, so the announcement is never left saying it's running
+            self._arm(session_data['end_time'], 'end', guild.id, session_data['message_id'])
+        
+        scheduled_by_guild: Dict[int, List[dict]] = {}
+        for session_data in scheduled:
+            scheduled_by_guild.setdefault(session_data['guild_id'], []).append(session_data)
+        
+        for guild_id, sessions in scheduled_by_guild.items():
+            guild = self.bot.get_guild(guild_id)
+            if not guild:
+                continue
+            try:
+                await self._rehydrate_scheduled(guild, sessions, now)
+            except Exception as e:
+                print(f"Error restoring scheduled sessions for guild {guild_id}: {e}")
         
-        # Check scheduled sessions for starting
-        for guild_id, sessions in list(self.scheduled_sessions.items()):
-            sessions_to_start = []
-            remaining_sessions = []
+        restored = sum(len(sessions) for sessions in self.scheduled_sessions.values())
+        print(f"Restored {len(self.active_sessions)} active and {restored} scheduled session(s)")
+    
+    async def _rehydrate_scheduled(self, guild: discord.Guild, sessions: List[dict], now: datetime):
+        """Restore one guild's scheduled sessions that still have a live server event"""
+        guild_id = guild.id
+        events = {event.id: event for event in await guild.fetch_scheduled_events(with_counts=False)}
+        # Sessions scheduled since startup are already in memory
+        known = {session['event_id'] for session in self.scheduled_sessions.get(guild_id, [])}
+        
+        for session_data in sessions:
+            if session_data['event_id'] in known:
+                continue
+            event = events.get(session_data['event_id'])
+            if event is None or event.status not in (discord.EventStatus.scheduled, discord.EventStatus.active):
+                # The event was deleted, cancelled or completed while offline
+                await save_session(session_store.remove_scheduled, session_data['event_id'])
+                continue
             
-            for session_data in sessions:
-                # Check if it's time to start (within 30 seconds)
-                if session_data['start_time'] <= now:
-                    sessions_to_start.append(session_data)
-                else:
-                    remaining_sessions.append(session_data)
+            # Follow the event if it was rescheduled in Discord
+            start_time = self._naive_utc(event.start_time)
+            if event.end_time:
+                end_time = self._naive_utc(event.end_time)
+            else:
+                end_time = start_time + (session_data['end_time'] - session_data['start_time'])
+            if (start_time, end_time) != (session_data['start_time'], session_data['end_time']):
+                session_data.update(start_time=start_time, end_time=end_time, title=event.name)
+                await save_session(
+                    session_store.save_scheduled, event.id, guild_id, session_data['host_id'], start_time,
+                    end_time, event.name
+                )
             
-            # Start scheduled sessions
-            for session_data in sessions_to_start:
-                await self._auto_start_scheduled_session(guild_id, session_data)
+            if session_data['end_time'] <= now:
+                await save_session(session_store.remove_scheduled, event.id)
+                continue
             
-            # Update scheduled sessions list
-            if remaining_sessions:
-                self.scheduled_sessions[guild_id] = remaining_sessions
-            else:
+            session_data.update(host=guild.get_member(session_data['host_id']), status='scheduled')
+            self.scheduled_sessions.setdefault(guild_id, []).append(session_data)
+            self._arm(session_data['start_time'], 'start', guild_id, event.id)
+    
+    @staticmethod
+    def _naive_utc(when: datetime) -> datetime:
+        """Convert an aware event time to the naive UTC times sessions are kept in"""
+        if when.tzinfo is None:
+            return when
+        return when.astimezone(timezone.utc).replace(tzinfo=None)
+    
+    async def _fire_timer(self, due: datetime, kind: str, guild_id: int, key: int):
+        """Run a due timer, skipping it if its session was cancelled or replaced"""
+        if kind == 'end':
+            session_data = self.active_sessions.get(guild_id)
+            if not session_data or session_data['message_id'] != key or session_data['end_time'] != due:
+                return
+            self._record_lateness(due)
+            await self._auto_end_session(guild_id)
+        
+        elif kind == 'start':
+            sessions = self.scheduled_sessions.get(guild_id, [])
+            session_data = next((session for session in sessions if session['event_id'] == key), None)
+            if not session_data or session_data['start_time'] != due:
+                return
+            sessions.remove(session_data)
+            if not sessions:
                 self.scheduled_sessions.pop(guild_id, None)
+            await save_session(session_store.remove_scheduled, key)
+            self._record_lateness(due)
+            await self._auto_start_scheduled_session(guild_id, session_data)
     
-    @check_sessions.before_loop
-    async def before_check_sessions(self):
-        """Wait until the bot is ready before starting the task"""
-        await self.bot.wait_until_ready()
+    def _record_lateness(self, due: datetime):
+        lateness = max((datetime.utcnow() - due).total_seconds(), 0.0)
+        self.lateness.append(lateness)
+        self.timers_fired += 1
+        print(f"Session timer fired {lateness:.2f}s after its due time")
     
     async def _auto_start_scheduled_session(self, guild_id: int, session_data: dict):
         """Automatically start a scheduled session"""
@@ -194,72 +361,82 @@ class SessionHandler:
             }
             
             self.active_sessions[guild_id] = active_session_data
-            
+            self._keep_announcement(guild_id, session_channel, message.id)
+            self._begin_attendance(guild)
+            self._arm(active_session_data['end_time'], 'end', guild_id, message.id)
+            await save_session(
+                session_store.save_active, guild_id, host.id, active_session_data['start_time'],
+                active_session_data['end_time'], message.id
+            )
+        
         except Exception as e:
             print(f"Error starting scheduled session: {e}")
     
+    def _take_session(self, guild_id: int) -> Tuple[Optional[dict], Optional[dict]]:
+        """Remove a guild's active session and its attendance before any await, so an end timer and a
+        cancel can't both act on it, and a session started meanwhile is left alone"""
+        session_data = self.active_sessions.pop(guild_id, None)
+        if session_data is None:
+            return None, None
+        self._rearm.set()
+        return session_data, self.attendance.pop(guild_id, None)
+    
+    async def _finish_session(self, guild_id: int, session_data: dict, records: Optional[dict]):
+        """Drop a taken session from the store and record its attendance"""
+        await save_session(session_store.remove_active, guild_id, session_data['message_id'])
+        await self._commit_attendance(records)
+    
     async def _auto_end_session(self, guild_id: int):
         """Automatically end a session"""
-        if guild_id not in self.active_sessions:
+        session_data, records = self._take_session(guild_id)
+        if session_data is None:
             return
-            
-        session_data = self.active_sessions[guild_id]
         
         start_timestamp = int(session_data['start_time'].timestamp())
         end_timestamp = int(session_data['end_time'].timestamp())
         
-        # Get session channel
-        session_channel = self.bot.get_channel(int(config.SESSION_CHANNEL_ID))
-        if session_channel and session_data['message_id']:
-            try:
-                message = await session_channel.fetch_message(session_data['message_id'])
-                
-                # Update embed
-                embed = discord.Embed(
-                    title="Waterstone Session Ending",
-                    description=f"Our session has now ended, thank you to everyone who attended. See you next time!\n\n**Host**: <@{session_data['host_id']}>\n**Start Time**: <t:{start_timestamp}:t>\n**End Time**: <t:{end_timestamp}:t>"
-                )
-                embed.set_image(url="https://media.discordapp.net/attachments/1353870922712354900/1437239861802303628/WSALine.png?ex=69205d2d&is=691f0bad&hm=263131bcaa38e47255cc8111dd97c0fff3df66e81296d25031d15e45ae1daeda&=&format=webp&quality=lossless")
-                
-                await message.edit(embed=embed)
-            except Exception as e:
-                print(f"Error ending session: {e}")
+        # Update embed
+        embed = discord.Embed(
+            title="Waterstone Session Ending",
+            description=f"Our session has now ended, thank you to everyone who attended. See you next time!\n\n**Host**: <@{session_data['host_id']}>\n**Start Time**: <t:{start_timestamp}:t>\n**End Time**: <t:{end_timestamp}:t>"
+        )
+        embed.set_image(url="https://media.discordapp.net/attachments/1353870922712354900/1437239861802303628/WSALine.png?ex=69205d2d&is=691f0bad&hm=263131bcaa38e47255cc8111dd97c0fff3df66e81296d25031d15e45ae1daeda&=&format=webp&quality=lossless")
         
-        # Remove session
-        self.active_sessions.pop(guild_id, None)
+        try:
+            await self._edit_announcement(guild_id, session_data, embed)
+        except Exception as e:
+            print(f"Error ending session: {e}")
         
+        await self._finish_session(guild_id, session_data, records)
+    
     async def cancel_session(self, interaction: discord.Interaction) -> bool:
         """Cancel the active session"""
         guild_id = interaction.guild.id
         
         # Check if there's an active session
-        if guild_id not in self.active_sessions:
+        session_data, records = self._take_session(guild_id)
+        if session_data is None:
             return False
-            
-        session_data = self.active_sessions[guild_id]
         
         start_timestamp = int(session_data['start_time'].timestamp())
         cancel_timestamp = int(datetime.utcnow().timestamp())
         
-        # Get session channel
-        session_channel = self.bot.get_channel(int(config.SESSION_CHANNEL_ID))
-        if session_channel and session_data['message_id']:
-            try:
-                message = await session_channel.fetch_message(session_data['message_id'])
-                
-                # Update embed
-                embed = discord.Embed(
-                    title="Waterstone Session Cancelled",
-                    description=f"Our session was cancelled, we're sorry for any inconveniences\ncaused. Our next session will be hopefully active and engaging.\n\n**Host**: <@{session_data['host_id']}>\n**Start Time**: <t:{start_timestamp}:t>\n**End Time**: <t:{cancel_timestamp}:t>"
-                )
-                embed.set_image(url="https://media.discordapp.net/attachments/1353870922712354900/1437239861802303628/WSALine.png?ex=69205d2d&is=691f0bad&hm=263131bcaa38e47255cc8111dd97c0fff3df66e81296d25031d15e45ae1daeda&=&format=webp&quality=lossless")
-                
-                await message.edit(embed=embed)
-            except:
-                pass
+        # Update embed
+        embed = discord.Embed(
+            title="Waterstone Session Cancelled",
+            description=f"Our session was cancelled, we're sorry for any inconveniences\ncaused. Our next session will be hopefully active and engaging.\n\n**Host**: <@{session_data['host_id']}>\n**Start Time**: <t:{start_timestamp}:t>\n**End Time**: <t:{cancel_timestamp}:t>"
+        )
+        embed.set_image(url="https://media.discordapp.net/attachments/1353870922712354900/1437239861802303628/WSALine.png?ex=69205d2d&is=691f0bad&hm=263131bcaa38e47255cc8111dd97c0fff3df66e81296d25031d15e45ae1daeda&=&format=webp&quality=lossless")
         
-        # Remove session
-        self.active_sessions.pop(guild_id)
+        try:
+            await self._edit_announcement(guild_id, session_data, embed)
+        except:
+            pass
+        
+        # The command answers once this returns, so the Firebase write can't hold up the interaction
+        task = asyncio.create_task(self._finish_session(guild_id, session_data, records))
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
         
         return True
     
@@ -273,6 +450,8 @@ class SessionHandler:
         for i, session in enumerate(sessions):
             if session['event_id'] == event_id:
                 sessions.pop(i)
+                self._rearm.set()
+                await save_session(session_store.remove_scheduled, event_id)
                 
                 # Delete the server event
                 guild = self.bot.get_guild(guild_id)
@@ -286,7 +465,66 @@ class SessionHandler:
                 return True
         
         return False
+    
+    def _is_session_voice_channel(self, channel) -> bool:
+        """Check if a voice channel counts towards session attendance"""
+        if channel is None:
+            return False
+        if config.SESSION_VOICE_CHANNEL_ID:
+            return channel.id == int(config.SESSION_VOICE_CHANNEL_ID)
+        return True
+    
+    def _begin_attendance(self, guild: discord.Guild):
+        """Start tracking attendance, counting members already in voice"""
+        now = time.monotonic()
+        records = {}
+        for channel in guild.voice_channels:
+            if not self._is_session_voice_channel(channel):
+                continue
+            for member in channel.members:
+                if not member.bot:
+                    records[member.id] = [0.0, now]
+        self.attendance[guild.id] = records
+    
+    def handle_voice_state_update(self, member: discord.Member, before: discord.VoiceState, after: discord.VoiceState):
+        """Open or close a member's attendance interval - call this from on_voice_state_update"""
+        records = self.attendance.get(member.guild.id)
+        if records is None or member.bot:
+            return
         
+        was_attending = self._is_session_voice_channel(before.channel)
+        is_attending = self._is_session_voice_channel(after.channel)
+        if was_attending == is_attending:
+            return
+        
+        now = time.monotonic()
+        record = records.get(member.id)
+        if is_attending:
+            if record is None:
+                records[member.id] = [0.0, now]
+            elif record[1] is None:
+                record[1] = now
+        elif record is not None and record[1] is not None:
+            record[0] += now - record[1]
+            record[1] = None
+    
+    async def _commit_attendance(self, records: Optional[dict]):
+        """Close all open intervals and write minutes and session counts in one batch"""
+        if not records or not hasattr(self.bot, 'activity_handler'):
+            return
+        
+        now = time.monotonic()
+        minutes_by_member = {}
+        for member_id, (seconds, joined_at) in records.items():
+            if joined_at is not None:
+                seconds += now - joined_at
+            minutes = int(seconds // 60)
+            if minutes > 0:
+                minutes_by_member[member_id] = minutes
+        
+        if minutes_by_member:
+            await self.bot.activity_handler.record_attendance(minutes_by_member)
+    
     def get_active_session(self, guild_id: int) -> Optional[dict]:
         """Get the active session for a guild"""
         return self.active_sessions.get(guild_id)
@@ -294,7 +532,7 @@ class SessionHandler:
     def get_scheduled_sessions(self, guild_id: int) -> list:
         """Get all scheduled sessions for a guild"""
         return self.scheduled_sessions.get(guild_id, [])
-        
+    
     def has_active_session(self, guild_id: int) -> bool:
         """Check if a guild has an active session"""
         return guild_id in self.active_sessions
\ No newline at end of file
@@ -0,0 +1,93 @@
+"""
+Session Store Module
+Persists scheduled and active sessions in local SQLite so they survive a restart
+"""
+
+import os
+import sqlite3
+from datetime import datetime
+from typing import List, Tuple
+import config
+from utilities.SqliteStore import SqliteStore, run_store_write
+
+
+class SessionStore(SqliteStore):
+    """Scheduled sessions keyed by event ID and active sessions keyed by guild ID"""
+    
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS scheduled_sessions (
+            event_id INTEGER PRIMARY KEY,
+            guild_id INTEGER,
+            host_id INTEGER,
+            start_time TEXT,
+            end_time TEXT,
+            title TEXT
+        );
+        CREATE TABLE IF NOT EXISTS active_sessions (
+            guild_id INTEGER PRIMARY KEY,
+            host_id INTEGER,
+            start_time TEXT,
+            end_time TEXT,
+            message_id INTEGER
+        );
+    """
+    
+    @staticmethod
+    def _from_row(row: sqlite3.Row) -> dict:
+        """Turn a row into session data, parsing the stored UTC times"""
+        session_data = dict(row)
+        session_data['start_time'] = datetime.fromisoformat(session_data['start_time'])
+        session_data['end_time'] = datetime.fromisoformat(session_data['end_time'])
+        return session_data
+    
+    def load(self) -> Tuple[List[dict], List[dict]]:
+        """Get every active and scheduled session"""
+        with self._lock:
+            conn = self._connect()
+            active = conn.execute("SELECT * FROM active_sessions").fetchall()
+            scheduled = conn.execute("SELECT * FROM scheduled_sessions ORDER BY start_time").fetchall()
+        return [self._from_row(row) for row in active], [self._from_row(row) for row in scheduled]
+    
+    def save_scheduled(self, event_id: int, guild_id: int, host_id: int, start_time: datetime,
+                       end_time: datetime, title: str):
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute(
+                    """INSERT OR REPLACE INTO scheduled_sessions (event_id, guild_id, host_id, start_time, end_time, title)
+                       VALUES (?, ?, ?, ?, ?, ?)""",
+                    (event_id, guild_id, host_id, start_time.isoformat(), end_time.isoformat(), title)
+                )
+    
+    def remove_scheduled(self, event_id: int):
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute("DELETE FROM scheduled_sessions WHERE event_id = ?", (event_id,))
+    
+    def save_active(self, guild_id: int, host_id: int, start_time: datetime, end_time: datetime,
+                    message_id: int):
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute(
+                    """INSERT OR REPLACE INTO active_sessions (guild_id, host_id, start_time, end_time, message_id)
+                       VALUES (?, ?, ?, ?, ?)""",
+                    (guild_id, host_id, start_time.isoformat(), end_time.isoformat(), message_id)
+                )
+    
+    def remove_active(self, guild_id: int, message_id: int):
+        """Drop a guild's active session, unless a newer one has replaced it"""
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute("DELETE FROM active_sessions WHERE guild_id = ? AND message_id = ?", (guild_id, message_id))
+
+
+# Global singleton instance
+session_store = SessionStore(os.path.join(config.DATA_DIR, "sessions.db"))
+
+
+async def save_session(method, *args):
+    """Run a store write in a worker thread - a failed write is logged, never raised into the session flow"""
+    await run_store_write("session record", method, *args)
@@ -0,0 +1,46 @@
+"""
+SQLite Store Module
+Shared connection handling for the local SQLite stores
+"""
+
+import asyncio
+import os
+import sqlite3
+import threading
+from typing import Optional
+
+
+class SqliteStore:
+    """One lazily opened connection guarded by a lock - subclasses set SCHEMA, and every method blocks,
+    so call them via asyncio.to_thread"""
+    
+    SCHEMA = ""
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Open the database on first use and create the tables"""
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.executescript(self.SCHEMA)
+        return self._conn
+    
+    def close_connection(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+async def run_store_write(description: str, method, *args):
+    """Run a store write in a worker thread - a failed write is logged and returns None instead of raising"""
+    try:
+        return await asyncio.to_thread(method, *args)
+    except Exception as e:
+        print(f"Error saving {description}: {e}")
+        return None
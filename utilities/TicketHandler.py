@@ -1,29 +1,122 @@
 import discord
 from discord.ui import View, Button, Modal, TextInput
 import asyncio
+import time
+from collections import deque
 from datetime import datetime
+from typing import Optional, Set
 import config
+from utilities.TranscriptHandler import start_live_log
+from utilities.TicketRegistry import ticket_registry, TICKET_CATEGORY_SET
+from utilities.TicketStore import ticket_store, save_ticket
+from utilities.TicketMetrics import ticket_metrics, METRICS_HISTORY_DAYS
 
-# Store blacklisted users in memory (kept for future use if needed)
+# Settings key for the ticket panel's message ID
+PANEL_MESSAGE_SETTING = "ticket_panel_message_id"
+
+# Queue wait times kept for the metrics
+QUEUE_METRICS_WINDOW = 500
+
+# Creation pacing backs off up to this after being rate limited
+MAX_CREATE_INTERVAL = 30.0
+
+# Keeps background topic edits alive until they finish
+_topic_tasks = set()
+
+# Blacklisted users, loaded from the ticket store on startup
 BLACKLISTED_USERS = set()
 
+# Token buckets are dropped once this many are tracked and they've refilled
+MAX_TRACKED_BUCKETS = 1000
+
 def is_user_blacklisted(user_id):
     """Check if a user is blacklisted"""
     return user_id in BLACKLISTED_USERS
 
-def blacklist_user(user_id):
+async def load_blacklist():
+    """Load the blacklist into memory"""
+    try:
+        users = await asyncio.to_thread(ticket_store.blacklisted_users)
+    except Exception as e:
+        print(f"Error loading ticket blacklist: {e}")
+        return
+    BLACKLISTED_USERS.clear()
+    BLACKLISTED_USERS.update(users)
+    print(f"Loaded {len(BLACKLISTED_USERS)} blacklisted user(s)")
+
+async def blacklist_user(user_id, reason=None, added_by_id=None):
     """Add a user to the blacklist"""
     BLACKLISTED_USERS.add(user_id)
+    await asyncio.to_thread(ticket_store.add_blacklist, user_id, reason, added_by_id)
 
-def unblacklist_user(user_id):
+async def unblacklist_user(user_id):
     """Remove a user from the blacklist"""
     BLACKLISTED_USERS.discard(user_id)
+    await asyncio.to_thread(ticket_store.remove_blacklist, user_id)
+
+class TicketRateLimiter:
+    """Per-user token buckets - a user can open a burst of tickets, then one per refill period"""
+    
+    def __init__(self):
+        self.capacity = float(config.TICKET_USER_BURST)
+        self.refill_seconds = float(config.TICKET_USER_REFILL_SECONDS)
+        self.buckets = {}  # user_id: [tokens, updated_at]
+    
+    def _refill(self, user_id: int, now: float) -> list:
+        bucket = self.buckets.get(user_id)
+        if bucket is None:
+            return [self.capacity, now]
+        bucket[0] = min(self.capacity, bucket[0] + (now - bucket[1]) / self.refill_seconds)
+        bucket[1] = now
+        return bucket
+    
+    def retry_after(self, user_id: int) -> float:
+        """Get the seconds until a token is available, without taking one"""
+        bucket = self.buckets.get(user_id)
+        if bucket is None:
+            return 0.0
+        tokens = min(self.capacity, bucket[0] + (time.monotonic() - bucket[1]) / self.refill_seconds)
+        return 0.0 if tokens >= 1 else (1 - tokens) * self.refill_seconds
+    
+    def refund(self, user_id: int):
+        """Give back a token taken for a ticket that was never queued"""
+        bucket = self.buckets.get(user_id)
+        if bucket is not None:
+            bucket[0] = min(self.capacity, bucket[0] + 1)
+    
+    def consume(self, user_id: int) -> float:
+        """Take a token, returning 0 if allowed or the seconds until one is available"""
+        now = time.monotonic()
+        bucket = self._refill(user_id, now)
+        if bucket[0] < 1:
+            self.buckets[user_id] = bucket
+            return (1 - bucket[0]) * self.refill_seconds
+        
+        bucket[0] -= 1
+        self.buckets[user_id] = bucket
+        if len(self.buckets) > MAX_TRACKED_BUCKETS:
+            self._prune(now)
+        return 0.0
+    
+    def _prune(self, now: float):
+        """Forget buckets that have refilled, since they behave like new ones"""
+        for user_id in [
+            user_id for user_id, (tokens, updated_at) in self.buckets.items()
+            if tokens + (now - updated_at) / self.refill_seconds >= self.capacity
+        ]:
+            del self.buckets[user_id]
+
+# Global ticket rate limiter
+ticket_rate_limiter = TicketRateLimiter()
 
 async def create_ticket_channel(guild, user, reason):
     """Create a new ticket channel for a user"""
     try:
-        # Get category
-        category = guild.get_channel(int(config.TICKET_CATEGORY_ID))
+        # Get the least full category
+        category = ticket_registry.pick_category(guild)
+        if not category:
+            print("Every ticket category is full")
+            return None
         
         # Set up permissions
         overwrites = {
@@ -66,18 +159,46 @@ async def create_ticket_channel(guild, user, reason):
             reason=f"Ticket created by {user} - {reason}"
         )
         
-        return channel
+        # Track ownership so lookups never need to scan members
+        ticket_registry.register(channel.id, user.id, open_reason=reason, category_id=category.id)
+        await save_ticket(ticket_store.create, channel.id, guild.id, user.id, reason)
+        ticket_metrics.record_open()
         
+        # Start the live transcript log before anything is posted
+        start_live_log(channel)
+        
+        return channel
+    
     except Exception as e:
         print(f"Error creating ticket channel: {e}")
         return None
 
+def update_ticket_topic(channel):
+    """Show the ticket's owner and claimer in its topic - cosmetic, so it runs in the background"""
+    if not config.TICKET_TOPIC_UPDATES:
+        return
+    
+    ticket = ticket_registry.get(channel.id)
+    if not ticket:
+        return
+    
+    topic = f"<@{ticket['owner_id']}>" if ticket['owner_id'] else ""
+    if ticket['claimed_by']:
+        topic = f"{topic} | Claimed by: {ticket['claimed_by']}" if topic else f"Claimed by: {ticket['claimed_by']}"
+    
+    async def edit_topic():
+        try:
+            await channel.edit(topic=topic)
+        except Exception as e:
+            print(f"Error updating ticket topic: {e}")
+    
+    task = asyncio.create_task(edit_topic())
+    _topic_tasks.add(task)
+    task.add_done_callback(_topic_tasks.discard)
+
 def is_ticket_channel(channel):
-    """Check if a channel is a ticket channel by checking if it's in the ticket category"""
-    try:
-        return channel.category_id == int(config.TICKET_CATEGORY_ID)
-    except:
-        return False
+    """Check if a channel is a ticket channel by checking if it's in a ticket category"""
+    return getattr(channel, 'category_id', None) in TICKET_CATEGORY_SET
 
 def has_staff_permissions(member):
     """Check if a member has staff permissions"""
@@ -87,17 +208,139 @@ def has_staff_permissions(member):
             return True
     return member.guild_permissions.manage_channels
 
-class TicketReasonModal(Modal, title='Create Support Ticket'):
-    reason = TextInput(
-        label='Reason for ticket',
-        placeholder='Please describe your issue or question.',
-        style=discord.TextStyle.paragraph,
-        required=True,
-        max_length=500
+async def send_ticket_welcome(ticket_channel, user, reason):
+    """Post the ticket info embeds, notifying the user and staff in the same message"""
+    content = user.mention
+    mentioned_roles = []
+    
+    # Ping permitted role
+    if config.PERMITTED_ROLE_ID:
+        permitted_role = ticket_channel.guild.get_role(int(config.PERMITTED_ROLE_ID))
+        if permitted_role:
+            content = f"{user.mention} {permitted_role.mention}"
+            mentioned_roles.append(permitted_role)
+    
+    # Send ticket info embeds
+    embed1 = discord.Embed(
+        title="Waterstone Support",
+        description=(
+            "Thank you for opening a ticket, a member of our Leadership Team will speak to you momentarily. "
+            "We advise you to follow our ticket rules when waiting for a response.\n\n"
+            "**Some thinks to remember**;\n"
+            "- Abusing the system will result into being moderated.\n"
+            "- Please allow 24-48 hours for our team to process your enquiry.\n"
+            "- Failure to respond to the ticket after a certain time will result in closure."
+        ),
+        color=None
     )
+    embed1.set_image(url="https://media.discordapp.net/attachments/1353870922712354900/1437239861802303628/WSALine.png?ex=693423ad&is=6932d22d&hm=96f2ac4bdc5294f7109fc750e3225b22e73dfef514ce605c545e6dadb26ebdb4&=&format=webp&quality=lossless")
     
-    async def on_submit(self, interaction: discord.Interaction):
-        ticket_channel = await create_ticket_channel(interaction.guild, interaction.user, self.reason.value)
+    embed2 = discord.Embed(
+        description=f"**Reason**: {reason}\n**Opened by**: {user.mention}",
+        color=None
+    )
+    embed2.set_image(url="https://media.discordapp.net/attachments/1353870922712354900/1437239861802303628/WSALine.png?ex=693423ad&is=6932d22d&hm=96f2ac4bdc5294f7109fc750e3225b22e73dfef514ce605c545e6dadb26ebdb4&=&format=webp&quality=lossless")
+    
+    await ticket_channel.send(
+        content=content,
+        embeds=[embed1, embed2],
+        allowed_mentions=discord.AllowedMentions(everyone=False, users=[user], roles=mentioned_roles)
+    )
+
+class TicketCreationQueue:
+    """Creates tickets one at a time, paced so bursts don't trip the channel creation rate limit"""
+    
+    def __init__(self):
+        self.queue: Optional[asyncio.Queue] = None
+        self.pending: Set[int] = set()  # user IDs queued or being created
+        self.wait_times = deque(maxlen=QUEUE_METRICS_WINDOW)
+        self.create_times = deque(maxlen=QUEUE_METRICS_WINDOW)
+        self.welcome_times = deque(maxlen=QUEUE_METRICS_WINDOW)
+        self.processed = 0
+        self.rejected = 0
+        self.interval = float(config.TICKET_CREATE_INTERVAL_SECONDS)
+        self._worker = None
+        self._busy = False
+    
+    def start(self):
+        """Start the worker - call this once the event loop is running"""
+        if self.queue is None:
+            self.queue = asyncio.Queue(maxsize=int(config.TICKET_QUEUE_MAX_SIZE))
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+    
+    def is_pending(self, user_id: int) -> bool:
+        return user_id in self.pending
+    
+    def submit(self, interaction: discord.Interaction, reason: str) -> tuple:
+        """Queue a ticket, returning its job and position, or (None, None) if the queue is full"""
+        self.start()
+        job = {
+            'interaction': interaction,
+            'reason': reason,
+            'queued_at': time.monotonic(),
+            'responded': asyncio.Event()
+        }
+        try:
+            self.queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return None, None
+        
+        self.pending.add(interaction.user.id)
+        return job, self.queue.qsize() + (1 if self._busy else 0)
+    
+    def metrics(self) -> dict:
+        """Queue length and wait times over the recent window"""
+        waits = sorted(self.wait_times)
+        return {
+            'queued': self.queue.qsize() if self.queue else 0,
+            'processed': self.processed,
+            'rejected': self.rejected,
+            'interval': self.interval,
+            'average_wait': sum(waits) / len(waits) if waits else 0.0,
+            'p95_wait': waits[int(len(waits) * 0.95)] if waits else 0.0,
+            'max_wait': waits[-1] if waits else 0.0,
+            'average_create': sum(self.create_times) / len(self.create_times) if self.create_times else 0.0,
+            'average_welcome': sum(self.welcome_times) / len(self.welcome_times) if self.welcome_times else 0.0
+        }
+    
+    async def _run(self):
+        base_interval = float(config.TICKET_CREATE_INTERVAL_SECONDS)
+        while True:
+            job = await self.queue.get()
+            self._busy = True
+            started = time.monotonic()
+            wait = started - job['queued_at']
+            self.wait_times.append(wait)
+            try:
+                await self._create(job)
+            except Exception as e:
+                print(f"Error processing queued ticket: {e}")
+            finally:
+                self.pending.discard(job['interaction'].user.id)
+                self.processed += 1
+                self._busy = False
+                self.queue.task_done()
+            
+            elapsed = time.monotonic() - started
+            print(f"Ticket for {job['interaction'].user} waited {wait:.2f}s in queue, created in {elapsed:.2f}s")
+            
+            # discord.py sleeps through rate limits, so a slow creation means we're going too fast
+            if elapsed > self.interval * 2:
+                self.interval = min(max(self.interval * 2, base_interval), MAX_CREATE_INTERVAL)
+            else:
+                self.interval = max(self.interval / 2, base_interval)
+            await asyncio.sleep(max(0.0, self.interval - elapsed))
+    
+    async def _create(self, job: dict):
+        interaction = job['interaction']
+        stage_started = time.perf_counter()
+        ticket_channel = await create_ticket_channel(interaction.guild, interaction.user, job['reason'])
+        self.create_times.append(time.perf_counter() - stage_started)
+        
+        # The queued reply has to exist before it can be edited
+        await job['responded'].wait()
         
         if ticket_channel:
             success_embed = discord.Embed(
@@ -106,37 +349,13 @@ class TicketReasonModal(Modal, title='Create Support Ticket'):
                 color=None
             )
             success_embed.set_image(url="https://media.discordapp.net/attachments/1353870922712354900/1437239861802303628/WSALine.png?ex=693423ad&is=6932d22d&hm=96f2ac4bdc5294f7109fc750e3225b22e73dfef514ce605c545e6dadb26ebdb4&=&format=webp&quality=lossless")
-            await interaction.response.send_message(embed=success_embed, ephemeral=True)
-            
-            # Ping permitted role
-            if config.PERMITTED_ROLE_ID:
-                permitted_role = interaction.guild.get_role(int(config.PERMITTED_ROLE_ID))
-                if permitted_role:
-                    ping_message = await ticket_channel.send(f"{permitted_role.mention}")
-                    await ping_message.delete()
+            await self._respond(interaction, success_embed)
             
-            # Send ticket info embeds
-            embed1 = discord.Embed(
-                title="Waterstone Support",
-                description=(
-                    "Thank you for opening a ticket, a member of our Leadership Team will speak to you momentarily. "
-                    "We advise you to follow our ticket rules when waiting for a response.\n\n"
-                    "**Some thinks to remember**;\n"
-                    "- Abusing the system will result into being moderated.\n"
-                    "- Please allow 24-48 hours for our team to process your enquiry.\n"
-                    "- Failure to respond to the ticket after a certain time will result in closure."
-                ),
-                color=None
-            )
-            embed1.set_image(url="https://media.discordapp.net/attachments/1353870922712354900/1437239861802303628/WSALine.png?ex=693423ad&is=6932d22d&hm=96f2ac4bdc5294f7109fc750e3225b22e73dfef514ce605c545e6dadb26ebdb4&=&format=webp&quality=lossless")
-            
-            embed2 = discord.Embed(
-                description=f"**Reason**: {self.reason.value}\n**Opened by**: {interaction.user.mention}",
-                color=None
-            )
-            embed2.set_image(url="https://media.discordapp.net/attachments/1353870922712354900/1437239861802303628/WSALine.png?ex=693423ad&is=6932d22d&hm=96f2ac4bdc5294f7109fc750e3225b22e73dfef514ce605c545e6dadb26ebdb4&=&format=webp&quality=lossless")
-            
-            await ticket_channel.send(content=interaction.user.mention, embeds=[embed1, embed2])
+            stage_started = time.perf_counter()
+            await send_ticket_welcome(ticket_channel, interaction.user, job['reason'])
+            welcome_time = time.perf_counter() - stage_started
+            self.welcome_times.append(welcome_time)
+            print(f"Ticket {ticket_channel.name}: channel created in {self.create_times[-1]:.2f}s, welcome sent in {welcome_time:.2f}s")
         else:
             error_embed = discord.Embed(
                 title="<:PersonWarning:1446847748677570651>   Waterstone Support",
@@ -144,7 +363,90 @@ class TicketReasonModal(Modal, title='Create Support Ticket'):
                 color=None
             )
             error_embed.set_image(url="https://media.discordapp.net/attachments/1353870922712354900/1437239861802303628/WSALine.png?ex=693423ad&is=6932d22d&hm=96f2ac4bdc5294f7109fc750e3225b22e73dfef514ce605c545e6dadb26ebdb4&=&format=webp&quality=lossless")
-            await interaction.response.send_message(embed=error_embed, ephemeral=True)
+            await self._respond(interaction, error_embed)
+    
+    @staticmethod
+    async def _respond(interaction: discord.Interaction, embed: discord.Embed):
+        """Replace the queued reply with the result"""
+        try:
+            await interaction.edit_original_response(embed=embed)
+        except discord.HTTPException as e:
+            print(f"Could not update queued ticket reply: {e}")
+
+# Global ticket creation queue
+ticket_queue = TicketCreationQueue()
+
+def find_open_ticket(guild, user_id: int):
+    """Get a user's open ticket channel - indexed by owner, so renamed tickets are still found"""
+    ticket_channel_id = ticket_registry.get_open_ticket(user_id)
+    if not ticket_channel_id:
+        return None
+    ticket_channel = guild.get_channel(ticket_channel_id)
+    if not ticket_channel:
+        ticket_registry.remove(ticket_channel_id)
+    return ticket_channel
+
+def _ticket_refusal(interaction: discord.Interaction) -> Optional[discord.Embed]:
+    """Get the reason a user can't open a ticket right now, checked before any token is spent"""
+    existing_ticket = find_open_ticket(interaction.guild, interaction.user.id)
+    if existing_ticket:
+        description = f"You already have an open ticket: {existing_ticket.mention}"
+    elif ticket_queue.is_pending(interaction.user.id):
+        description = "Your ticket is already being created!"
+    else:
+        retry_after = ticket_rate_limiter.retry_after(interaction.user.id)
+        if not retry_after:
+            return None
+        description = f"You're creating tickets too quickly. Please try again <t:{int(time.time() + retry_after)}:R>."
+    
+    embed = discord.Embed(
+        title="<:Cross:1446847583510331392>   Waterstone Support",
+        description=description,
+        color=None
+    )
+    embed.set_image(url="https://media.discordapp.net/attachments/1353870922712354900/1437239861802303628/WSALine.png?ex=693423ad&is=6932d22d&hm=96f2ac4bdc5294f7109fc750e3225b22e73dfef514ce605c545e6dadb26ebdb4&=&format=webp&quality=lossless")
+    return embed
+
+class TicketReasonModal(Modal, title='Create Support Ticket'):
+    reason = TextInput(
+        label='Reason for ticket',
+        placeholder='Please describe your issue or question.',
+        style=discord.TextStyle.paragraph,
+        required=True,
+        max_length=500
+    )
+    
+    async def on_submit(self, interaction: discord.Interaction):
+        # The modal may have been opened twice, so check again before spending a token
+        refusal = _ticket_refusal(interaction)
+        if refusal:
+            await interaction.response.send_message(embed=refusal, ephemeral=True)
+            return
+        
+        ticket_rate_limiter.consume(interaction.user.id)
+        job, position = ticket_queue.submit(interaction, self.reason.value)
+        
+        if not job:
+            ticket_rate_limiter.refund(interaction.user.id)
+            busy_embed = discord.Embed(
+                title="<:PersonWarning:1446847748677570651>   Waterstone Support",
+                description="We're receiving a lot of tickets right now. Please try again in a few minutes.",
+                color=None
+            )
+            busy_embed.set_image(url="https://media.discordapp.net/attachments/1353870922712354900/1437239861802303628/WSALine.png?ex=693423ad&is=6932d22d&hm=96f2ac4bdc5294f7109fc750e3225b22e73dfef514ce605c545e6dadb26ebdb4&=&format=webp&quality=lossless")
+            await interaction.response.send_message(embed=busy_embed, ephemeral=True)
+            return
+        
+        queued_embed = discord.Embed(
+            title="<:People:1446847702804598886>   Waterstone Support",
+            description=f"Your ticket is being created, you're number **{position}** in the queue.",
+            color=None
+        )
+        queued_embed.set_image(url="https://media.discordapp.net/attachments/1353870922712354900/1437239861802303628/WSALine.png?ex=693423ad&is=6932d22d&hm=96f2ac4bdc5294f7109fc750e3225b22e73dfef514ce605c545e6dadb26ebdb4&=&format=webp&quality=lossless")
+        try:
+            await interaction.response.send_message(embed=queued_embed, ephemeral=True)
+        finally:
+            job['responded'].set()
 
 class TicketPanelView(View):
     def __init__(self):
@@ -156,19 +458,23 @@ class TicketPanelView(View):
         custom_id='create_ticket_button'
     )
     async def create_ticket_button(self, interaction: discord.Interaction, button: discord.ui.Button):
-        guild = interaction.guild
-        existing_ticket = discord.utils.get(guild.channels, name=f"ticket-{interaction.user.name.lower()}")
-        
-        if existing_ticket:
+        # Served from memory before any other work
+        if is_user_blacklisted(interaction.user.id):
             embed = discord.Embed(
                 title="<:Cross:1446847583510331392>   Waterstone Support",
-                description=f"You already have an open ticket: {existing_ticket.mention}",
+                description="You are not allowed to create tickets.",
                 color=None
             )
             embed.set_image(url="https://media.discordapp.net/attachments/1353870922712354900/1437239861802303628/WSALine.png?ex=693423ad&is=6932d22d&hm=96f2ac4bdc5294f7109fc750e3225b22e73dfef514ce605c545e6dadb26ebdb4&=&format=webp&quality=lossless")
             await interaction.response.send_message(embed=embed, ephemeral=True)
             return
         
+        # The token is only spent when the modal is submitted
+        refusal = _ticket_refusal(interaction)
+        if refusal:
+            await interaction.response.send_message(embed=refusal, ephemeral=True)
+            return
+        
         modal = TicketReasonModal()
         await interaction.response.send_modal(modal)
 
@@ -192,6 +498,18 @@ async def create_ticket_panel(channel):
     message = await channel.send(embed=embed, view=view)
     return message
 
+async def find_existing_panel(bot, ticket_channel):
+    """Look through the recent history for a panel - only used until its ID is stored"""
+    async for message in ticket_channel.history(limit=100):
+        if message.author == bot.user:
+            # Check if message has embeds
+            if message.embeds:
+                embed = message.embeds[0]
+                # Check if this is the ticket panel embed
+                if "Waterstone Support" in str(embed.title):
+                    return message
+    return None
+
 async def check_and_create_panel(bot):
     """Check if the ticket panel exists, if not create it"""
     try:
@@ -209,23 +527,27 @@ async def check_and_create_panel(bot):
         
         print(f"Ticket channel found: {ticket_channel.name}")
         
-        # Check if panel already exists by looking for messages with the button
-        panel_exists = False
-        async for message in ticket_channel.history(limit=100):
-            if message.author == bot.user:
-                # Check if message has embeds
-                if message.embeds:
-                    embed = message.embeds[0]
-                    # Check if this is the ticket panel embed
-                    if "Waterstone Support" in str(embed.title):
-                        panel_exists = True
-                        print("Ticket panel already exists")
-                        break
-        
-        if not panel_exists:
-            print("Creating ticket panel...")
-            await create_ticket_panel(ticket_channel)
-            print("Ticket panel created successfully!")
+        # Verify the stored panel with a single fetch
+        panel_id = await asyncio.to_thread(ticket_store.get_setting, PANEL_MESSAGE_SETTING)
+        if panel_id:
+            try:
+                await ticket_channel.fetch_message(int(panel_id))
+                print("Ticket panel already exists")
+                return
+            except discord.NotFound:
+                print("Stored ticket panel was deleted")
+        else:
+            # No ID stored yet, so look for a panel posted before IDs were kept
+            panel = await find_existing_panel(bot, ticket_channel)
+            if panel:
+                await asyncio.to_thread(ticket_store.set_setting, PANEL_MESSAGE_SETTING, str(panel.id))
+                print("Ticket panel already exists")
+                return
+        
+        print("Creating ticket panel...")
+        message = await create_ticket_panel(ticket_channel)
+        await asyncio.to_thread(ticket_store.set_setting, PANEL_MESSAGE_SETTING, str(message.id))
+        print("Ticket panel created successfully!")
     
     except Exception as e:
         print(f"Error checking/creating ticket panel: {e}")
@@ -239,9 +561,37 @@ def setup_ticket_handler(bot):
     # Register the persistent view so buttons work after restart
     bot.add_view(TicketPanelView())
     
+    # Start creating queued tickets
+    ticket_queue.start()
+    
     # Schedule the panel check for after the bot is ready
     async def delayed_check():
         await bot.wait_until_ready()
+        
+        await load_blacklist()
+        
+        # Rebuild the open ticket registry from the categories
+        guild = bot.get_guild(int(config.GUILD_ID))
+        if guild:
+            try:
+                records = await asyncio.to_thread(ticket_store.open_tickets, guild.id)
+            except Exception as e:
+                print(f"Error loading ticket records: {e}")
+                records = {}
+            ticket_registry.rebuild(guild, records)
+            
+            # Seed the SLA metrics
+            ticket_metrics.set_backlog(
+                len(ticket_registry.tickets),
+                sum(1 for ticket in ticket_registry.tickets.values() if not ticket['claimed_by'])
+            )
+            if not ticket_metrics.history_loaded:
+                try:
+                    since = int(time.time()) - METRICS_HISTORY_DAYS * 24 * 3600
+                    ticket_metrics.load_history(await asyncio.to_thread(ticket_store.closed_since, since))
+                except Exception as e:
+                    print(f"Error loading ticket metrics history: {e}")
+        
         print("Bot is ready, checking ticket panel...")
         await check_and_create_panel(bot)
     
@@ -0,0 +1,124 @@
+"""
+Ticket Metrics Module
+In-process SLA aggregates - time-to-claim and time-to-close histograms and backlog gauges
+"""
+
+import bisect
+from typing import Iterable, List, Optional, Tuple
+
+# Histogram bucket upper bounds in seconds, matching the "24-48 hours" support promise
+DURATION_BUCKETS = [
+    5 * 60, 15 * 60, 30 * 60, 60 * 60, 2 * 3600, 4 * 3600, 8 * 3600, 24 * 3600, 48 * 3600, 7 * 24 * 3600
+]
+
+# Closed tickets loaded into the histograms on startup
+METRICS_HISTORY_DAYS = 30
+
+
+def format_duration(seconds: Optional[float]) -> str:
+    """Format a duration like 1d 4h, 3h 12m or 45m"""
+    if seconds is None:
+        return "N/A"
+    minutes = int(seconds // 60)
+    days, minutes = divmod(minutes, 24 * 60)
+    hours, minutes = divmod(minutes, 60)
+    if days:
+        return f"{days}d {hours}h"
+    if hours:
+        return f"{hours}h {minutes}m"
+    return f"{minutes}m"
+
+
+class DurationHistogram:
+    """Fixed-bucket histogram, so recording and reading are both constant time"""
+    
+    def __init__(self, bounds: List[int] = DURATION_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # The last bucket holds anything over the largest bound
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+    
+    def observe(self, seconds: float):
+        seconds = max(seconds, 0.0)
+        self.counts[bisect.bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+    
+    @property
+    def average(self) -> Optional[float]:
+        return self.total / self.count if self.count else None
+    
+    def percentile(self, fraction: float) -> Tuple[Optional[float], bool]:
+        """Upper bound of the bucket holding the given fraction of observations, and whether it fell
+        in the overflow bucket - the bound is then the largest one, which the observations exceed"""
+        if not self.count:
+            return None, False
+        target = fraction * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts[:-1]):
+            seen += bucket_count
+            if seen >= target:
+                return self.bounds[index], False
+        return self.bounds[-1], True
+    
+    def within(self, seconds: float) -> Optional[float]:
+        """Fraction of observations at or under a bucket bound"""
+        if not self.count:
+            return None
+        index = bisect.bisect_right(self.bounds, seconds)
+        return sum(self.counts[:index]) / self.count
+
+
+class TicketMetrics:
+    """Ticket SLA metrics, updated as tickets are opened, claimed and closed"""
+    
+    def __init__(self):
+        self.time_to_claim = DurationHistogram()
+        self.time_to_close = DurationHistogram()
+        self.open_tickets = 0
+        self.unclaimed_tickets = 0
+        self.opened = 0
+        self.claimed = 0
+        self.closed = 0
+        self.history_loaded = False
+    
+    def set_backlog(self, open_tickets: int, unclaimed_tickets: int):
+        """Set the backlog gauges, after the registry is rebuilt"""
+        self.open_tickets = open_tickets
+        self.unclaimed_tickets = unclaimed_tickets
+    
+    def load_history(self, records: Iterable[dict]):
+        """Fill the histograms from closed ticket records - only the first call counts"""
+        if self.history_loaded:
+            return
+        self.history_loaded = True
+        for record in records:
+            if record['opened_at'] is not None and record['claimed_at'] is not None:
+                self.time_to_claim.observe(record['claimed_at'] - record['opened_at'])
+            if record['opened_at'] is not None and record['closed_at'] is not None:
+                self.time_to_close.observe(record['closed_at'] - record['opened_at'])
+    
+    def record_open(self):
+        self.opened += 1
+        self.open_tickets += 1
+        self.unclaimed_tickets += 1
+    
+    def record_claim(self, record: Optional[dict]):
+        self.claimed += 1
+        self.unclaimed_tickets = max(self.unclaimed_tickets - 1, 0)
+        if record and record['opened_at'] is not None and record['claimed_at'] is not None:
+            self.time_to_claim.observe(record['claimed_at'] - record['opened_at'])
+    
+    def record_close(self, record: Optional[dict], was_claimed: bool):
+        self.closed += 1
+        self.open_tickets = max(self.open_tickets - 1, 0)
+        if not was_claimed:
+            self.unclaimed_tickets = max(self.unclaimed_tickets - 1, 0)
+        if record and record['opened_at'] is not None and record['closed_at'] is not None:
+            self.time_to_close.observe(record['closed_at'] - record['opened_at'])
+
+
+# Global singleton instance
+ticket_metrics = TicketMetrics()
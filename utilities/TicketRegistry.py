@@ -0,0 +1,146 @@
+"""
+Ticket Registry Module
+In-memory index of open tickets so ownership lookups never scan members
+"""
+
+import discord
+from typing import Dict, Optional
+import config
+
+# Discord allows this many channels in a category
+CATEGORY_CHANNEL_LIMIT = 50
+
+# Ticket categories, filled least full first
+TICKET_CATEGORY_POOL = [
+    int(category_id) for category_id in (config.TICKET_CATEGORY_IDS or config.TICKET_CATEGORY_ID or "").split(",")
+    if category_id.strip()
+]
+TICKET_CATEGORY_SET = frozenset(TICKET_CATEGORY_POOL)
+
+
+def _owner_from_topic(topic: Optional[str]) -> Optional[int]:
+    """Get the owner ID stored in a ticket topic"""
+    if topic and topic.startswith("<@") and ">" in topic:
+        try:
+            return int(topic.split(">")[0].replace("<@", "").replace("!", ""))
+        except ValueError:
+            pass
+    return None
+
+
+def _claimer_from_topic(topic: Optional[str]) -> Optional[str]:
+    if topic and "Claimed by:" in topic:
+        return topic.split("Claimed by:")[-1].strip()
+    return None
+
+
+def owner_from_overwrites(channel) -> Optional[int]:
+    """Find the ticket owner among the channel's member overwrites (a handful of entries, not every member)"""
+    permitted_role_id = int(config.PERMITTED_ROLE_ID) if config.PERMITTED_ROLE_ID else None
+    for target, overwrite in channel.overwrites.items():
+        if not isinstance(target, discord.Member) or target.bot:
+            continue
+        if not overwrite.read_messages or not overwrite.send_messages:
+            continue
+        # Staff added to the ticket aren't the owner
+        if permitted_role_id and any(role.id == permitted_role_id for role in target.roles):
+            continue
+        return target.id
+    return None
+
+
+class TicketRegistry:
+    """Maps open ticket channels to their owner, claimer and open reason, owners back to their ticket,
+    and tracks how full each ticket category is"""
+    
+    def __init__(self):
+        self.tickets: Dict[int, dict] = {}  # channel_id: {'owner_id', 'claimed_by', 'open_reason', 'category_id'}
+        self.owners: Dict[int, int] = {}  # owner_id: channel_id
+        self.category_counts: Dict[int, int] = {category_id: 0 for category_id in TICKET_CATEGORY_POOL}
+    
+    def register(self, channel_id: int, owner_id: Optional[int], open_reason: str = None, claimed_by: str = None,
+                 category_id: Optional[int] = None):
+        """Record a ticket"""
+        self.remove(channel_id)
+        if owner_id:
+            self.owners[owner_id] = channel_id
+        if category_id in self.category_counts:
+            self.category_counts[category_id] += 1
+        self.tickets[channel_id] = {
+            'owner_id': owner_id,
+            'claimed_by': claimed_by,
+            'open_reason': open_reason,
+            'category_id': category_id
+        }
+    
+    def get(self, channel_id: int) -> Optional[dict]:
+        return self.tickets.get(channel_id)
+    
+    def set_claimer(self, channel_id: int, claimed_by: str):
+        ticket = self.tickets.get(channel_id)
+        if ticket is not None:
+            ticket['claimed_by'] = claimed_by
+    
+    def get_open_ticket(self, owner_id: int) -> Optional[int]:
+        """Get the channel ID of a user's open ticket"""
+        return self.owners.get(owner_id)
+    
+    def remove(self, channel_id: int):
+        ticket = self.tickets.pop(channel_id, None)
+        if not ticket:
+            return
+        if self.owners.get(ticket['owner_id']) == channel_id:
+            del self.owners[ticket['owner_id']]
+        if ticket['category_id'] in self.category_counts:
+            self.category_counts[ticket['category_id']] = max(self.category_counts[ticket['category_id']] - 1, 0)
+    
+    def pick_category(self, guild):
+        """Get the least full ticket category with room for another channel"""
+        for category_id in sorted(self.category_counts, key=self.category_counts.get):
+            if self.category_counts[category_id] >= CATEGORY_CHANNEL_LIMIT:
+                break
+            category = guild.get_channel(category_id)
+            if category:
+                return category
+        return None
+    
+    def register_from_channel(self, channel) -> dict:
+        """Rebuild a channel's entry from its topic, falling back to its overwrites for the owner"""
+        owner_id = _owner_from_topic(channel.topic) or owner_from_overwrites(channel)
+        self.register(channel.id, owner_id, claimed_by=_claimer_from_topic(channel.topic),
+                      category_id=channel.category_id)
+        return self.tickets[channel.id]
+    
+    def register_from_record(self, record: dict, category_id: Optional[int] = None):
+        """Record a ticket from its stored record"""
+        self.register(record['channel_id'], record['owner_id'], record['open_reason'], record['claimed_by'],
+                      category_id)
+    
+    def rebuild(self, guild, records: Dict[int, dict] = None):
+        """Rebuild the registry from the ticket categories, preferring stored records over topics"""
+        self.tickets.clear()
+        self.owners.clear()
+        records = records or {}
+        
+        for category_id in TICKET_CATEGORY_POOL:
+            category = guild.get_channel(category_id)
+            if not category:
+                print(f"Ticket category not found! Category ID: {category_id}")
+                # Never pick a category that doesn't exist
+                self.category_counts[category_id] = CATEGORY_CHANNEL_LIMIT
+                continue
+            
+            for channel in category.text_channels:
+                if channel.id in records:
+                    self.register_from_record(records[channel.id], category_id)
+                else:
+                    self.register_from_channel(channel)
+            
+            # Every channel counts towards the limit, not just tickets
+            self.category_counts[category_id] = len(category.channels)
+        
+        print(f"Ticket registry rebuilt with {len(self.tickets)} open ticket(s)")
+
+
+# Global singleton instance
+ticket_registry = TicketRegistry()
@@ -0,0 +1,157 @@
+"""
+Ticket Store Module
+Persists ticket records in local SQLite, optionally mirrored to Firebase
+"""
+
+import asyncio
+import os
+import sqlite3
+import time
+from typing import Dict, List, Optional, Set
+import config
+from utilities.FirebaseHandler import firebase
+from utilities.SqliteStore import SqliteStore, run_store_write
+
+# Keeps background mirror writes alive until they finish
+_background_tasks = set()
+
+
+class TicketStore(SqliteStore):
+    """Ticket records keyed by channel ID"""
+    
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS tickets (
+            channel_id INTEGER PRIMARY KEY,
+            guild_id INTEGER,
+            owner_id INTEGER,
+            open_reason TEXT,
+            opened_at INTEGER,
+            claimed_by_id INTEGER,
+            claimed_by TEXT,
+            claimed_at INTEGER,
+            closed_by_id INTEGER,
+            close_reason TEXT,
+            closed_at INTEGER
+        );
+        CREATE INDEX IF NOT EXISTS tickets_open ON tickets (closed_at);
+        CREATE TABLE IF NOT EXISTS blacklist (
+            user_id INTEGER PRIMARY KEY,
+            reason TEXT,
+            added_by_id INTEGER,
+            added_at INTEGER
+        );
+        CREATE TABLE IF NOT EXISTS settings (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+    """
+    
+    def _get(self, conn: sqlite3.Connection, channel_id: int) -> Optional[dict]:
+        row = conn.execute("SELECT * FROM tickets WHERE channel_id = ?", (channel_id,)).fetchone()
+        return dict(row) if row else None
+    
+    def get(self, channel_id: int) -> Optional[dict]:
+        with self._lock:
+            return self._get(self._connect(), channel_id)
+    
+    def open_tickets(self, guild_id: int) -> Dict[int, dict]:
+        """Get every ticket in a guild that hasn't been closed, keyed by channel ID"""
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT * FROM tickets WHERE closed_at IS NULL AND guild_id = ?", (guild_id,)
+            ).fetchall()
+        return {row['channel_id']: dict(row) for row in rows}
+    
+    def closed_since(self, since: int) -> List[dict]:
+        """Get tickets closed at or after a unix timestamp"""
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT * FROM tickets WHERE closed_at >= ?", (since,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+    
+    def create(self, channel_id: int, guild_id: int, owner_id: Optional[int], open_reason: Optional[str]) -> dict:
+        """Record a new ticket"""
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute(
+                    """INSERT OR REPLACE INTO tickets (channel_id, guild_id, owner_id, open_reason, opened_at)
+                       VALUES (?, ?, ?, ?, ?)""",
+                    (channel_id, guild_id, owner_id, open_reason, int(time.time()))
+                )
+            return self._get(conn, channel_id)
+    
+    def claim(self, channel_id: int, guild_id: int, owner_id: Optional[int],
+              claimed_by_id: int, claimed_by: str) -> dict:
+        """Record who claimed a ticket, adding the ticket if it predates the store"""
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute(
+                    """INSERT INTO tickets (channel_id, guild_id, owner_id, claimed_by_id, claimed_by, claimed_at)
+                       VALUES (?, ?, ?, ?, ?, ?)
+                       ON CONFLICT (channel_id) DO UPDATE SET claimed_by_id = excluded.claimed_by_id,
+                           claimed_by = excluded.claimed_by, claimed_at = excluded.claimed_at""",
+                    (channel_id, guild_id, owner_id, claimed_by_id, claimed_by, int(time.time()))
+                )
+            return self._get(conn, channel_id)
+    
+    def close(self, channel_id: int, closed_by_id: Optional[int], close_reason: Optional[str]) -> Optional[dict]:
+        """Record that a ticket was closed - only the first close counts"""
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                cursor = conn.execute(
+                    """UPDATE tickets SET closed_by_id = ?, close_reason = ?, closed_at = ?
+                       WHERE channel_id = ? AND closed_at IS NULL""",
+                    (closed_by_id, close_reason, int(time.time()), channel_id)
+                )
+            return self._get(conn, channel_id) if cursor.rowcount else None
+    
+    def blacklisted_users(self) -> Set[int]:
+        with self._lock:
+            rows = self._connect().execute("SELECT user_id FROM blacklist").fetchall()
+        return {row['user_id'] for row in rows}
+    
+    def add_blacklist(self, user_id: int, reason: Optional[str], added_by_id: int):
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO blacklist (user_id, reason, added_by_id, added_at) VALUES (?, ?, ?, ?)",
+                    (user_id, reason, added_by_id, int(time.time()))
+                )
+    
+    def remove_blacklist(self, user_id: int):
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute("DELETE FROM blacklist WHERE user_id = ?", (user_id,))
+    
+    def get_setting(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._connect().execute("SELECT value FROM settings WHERE key = ?", (key,)).fetchone()
+        return row['value'] if row else None
+    
+    def set_setting(self, key: str, value: str):
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)", (key, value))
+
+
+# Global singleton instance
+ticket_store = TicketStore(os.path.join(config.DATA_DIR, "tickets.db"))
+
+
+async def save_ticket(method, *args) -> Optional[dict]:
+    """Run a store write in a worker thread and mirror the record to Firebase in the background"""
+    record = await run_store_write("ticket record", method, *args)
+    if record and config.TICKET_STORE_FIREBASE_MIRROR:
+        task = asyncio.create_task(
+            asyncio.to_thread(firebase.update, f"tickets/{record['channel_id']}", record)
+        )
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+    return record
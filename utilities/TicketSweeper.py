@@ -0,0 +1,193 @@
+"""
+Ticket Sweeper Module
+Warns about and closes tickets left waiting on their owner, waking only when a deadline is due
+"""
+
+import discord
+import asyncio
+import heapq
+import time
+from typing import Dict, List, Optional, Tuple
+import config
+from utilities.TicketRegistry import TICKET_CATEGORY_POOL, TICKET_CATEGORY_SET, ticket_registry
+from utilities.TranscriptHandler import close_ticket
+
+
+# Recent messages checked on startup for the last human reply in each ticket
+SEED_HISTORY_LIMIT = 20
+
+
+def _owner_of(channel) -> Optional[int]:
+    """Get a ticket's owner from the registry"""
+    ticket = ticket_registry.get(channel.id)
+    if ticket is None:
+        # Not seen since startup - rebuild from the topic and overwrites
+        ticket = ticket_registry.register_from_channel(channel)
+    return ticket['owner_id']
+
+
+class TicketSweeper:
+    """Deadline heap over tickets waiting on their owner - the clock only runs after a staff reply, and
+    stops when the owner answers. Messages only move a timestamp, and an entry is re-armed when it
+    comes due early"""
+    
+    def __init__(self):
+        self.bot = None
+        self.warn_after = float(config.TICKET_INACTIVITY_WARN_HOURS) * 3600
+        self.close_after = float(config.TICKET_INACTIVITY_CLOSE_HOURS) * 3600
+        self.last_activity: Dict[int, float] = {}  # channel_id: unix time of the last message
+        self.warned_at: Dict[int, float] = {}  # channel_id: unix time the warning was posted
+        self._heap: List[Tuple[float, int]] = []  # (deadline, channel_id)
+        self._scheduled = set()  # channel IDs with an entry in the heap
+        self._wakeup = asyncio.Event()
+        self._task = None
+    
+    def start(self, bot):
+        """Seed the ticket deadlines and start sleeping on them - call this after bot is ready"""
+        if not config.TICKET_AUTO_CLOSE:
+            return
+        self.bot = bot
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+    
+    async def _seed(self):
+        """Track every open ticket whose last human reply came from staff"""
+        for category_id in TICKET_CATEGORY_POOL:
+            category = self.bot.get_channel(category_id)
+            if not category:
+                continue
+            for channel in category.text_channels:
+                if channel.id in self.last_activity or not channel.last_message_id:
+                    continue
+                try:
+                    async for message in channel.history(limit=SEED_HISTORY_LIMIT):
+                        if not message.author.bot:
+                            self._record_reply(channel, message.author.id, message.created_at.timestamp())
+                            break
+                except discord.HTTPException as e:
+                    print(f"Error reading ticket {channel.id} for the sweeper: {e}")
+    
+    def _schedule(self, deadline: float, channel_id: int):
+        heapq.heappush(self._heap, (deadline, channel_id))
+        self._scheduled.add(channel_id)
+        # Wake the sleeper if this deadline is now the earliest
+        if self._heap[0][1] == channel_id:
+            self._wakeup.set()
+    
+    def track(self, channel_id: int, timestamp: float = None):
+        """Record a staff reply in a ticket, starting or pushing back its deadline"""
+        if not config.TICKET_AUTO_CLOSE:
+            return
+        self.last_activity[channel_id] = timestamp or time.time()
+        if channel_id not in self._scheduled:
+            self._schedule(self.last_activity[channel_id] + self.warn_after, channel_id)
+    
+    def record_message(self, message):
+        """Start the clock on a staff reply and stop it on the owner's - the bot's own messages don't count"""
+        if message.author.bot:
+            return
+        if getattr(message.channel, 'category_id', None) in TICKET_CATEGORY_SET:
+            self._record_reply(message.channel, message.author.id, message.created_at.timestamp())
+    
+    def _record_reply(self, channel, author_id: int, timestamp: float):
+        owner_id = _owner_of(channel)
+        if owner_id is None:
+            # Without an owner there's no telling who the ticket is waiting on
+            return
+        if author_id == owner_id:
+            # Waiting on staff now, which never closes a ticket
+            self.forget(channel.id)
+        else:
+            self.track(channel.id, timestamp)
+    
+    def forget(self, channel_id: int):
+        """Stop tracking a ticket - its heap entry is dropped when it comes due"""
+        self.last_activity.pop(channel_id, None)
+        self.warned_at.pop(channel_id, None)
+    
+    async def _run(self):
+        await self.bot.wait_until_ready()
+        await self._seed()
+        print(f"Ticket sweeper tracking {len(self.last_activity)} ticket(s) waiting on their owner")
+        
+        while True:
+            self._wakeup.clear()
+            if not self._heap:
+                await self._wakeup.wait()
+                continue
+            
+            delay = self._heap[0][0] - time.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            
+            _, channel_id = heapq.heappop(self._heap)
+            self._scheduled.discard(channel_id)
+            try:
+                await self._expire(channel_id)
+            except Exception as e:
+                print(f"Error sweeping ticket {channel_id}: {e}")
+    
+    async def _expire(self, channel_id: int):
+        """Handle a due entry, re-arming it if the ticket saw activity since it was scheduled"""
+        last = self.last_activity.get(channel_id)
+        if last is None:
+            return
+        
+        channel = self.bot.get_channel(channel_id)
+        if channel is None:
+            self.forget(channel_id)
+            return
+        
+        now = time.time()
+        warned_at = self.warned_at.get(channel_id)
+        if warned_at is not None and last > warned_at:
+            # Someone replied after the warning
+            del self.warned_at[channel_id]
+            warned_at = None
+        
+        if warned_at is None:
+            if last + self.warn_after > now:
+                self._schedule(last + self.warn_after, channel_id)
+                return
+            await self._warn(channel, self._close_deadline(last, now))
+            self.warned_at[channel_id] = now
+            self._schedule(self._close_deadline(last, now), channel_id)
+            return
+        
+        close_at = self._close_deadline(last, warned_at)
+        if close_at > now:
+            self._schedule(close_at, channel_id)
+            return
+        
+        print(f"Closing ticket {channel.name} after no reply from its owner")
+        self.forget(channel_id)
+        await close_ticket(channel, channel.guild.me, close_reason="No reply from the ticket owner")
+    
+    def _close_deadline(self, last: float, warned_at: float) -> float:
+        """Close after the full inactivity period, but never sooner after the warning than the gap between them"""
+        return max(last + self.close_after, warned_at + self.close_after - self.warn_after)
+    
+    async def _warn(self, channel, close_at: float):
+        owner_id = _owner_of(channel)
+        embed = discord.Embed(
+            title="<:PersonWarning:1446847748677570651>   Waterstone Support",
+            description=(
+                f"This ticket has been waiting on your reply for {config.TICKET_INACTIVITY_WARN_HOURS} hours and "
+                f"will be closed <t:{int(close_at)}:R> unless you reply."
+            ),
+            color=None
+        )
+        embed.set_image(url="https://media.discordapp.net/attachments/1353870922712354900/1437239861802303628/WSALine.png?ex=693423ad&is=6932d22d&hm=96f2ac4bdc5294f7109fc750e3225b22e73dfef514ce605c545e6dadb26ebdb4&=&format=webp&quality=lossless")
+        await channel.send(
+            content=f"<@{owner_id}>" if owner_id else None,
+            embed=embed,
+            allowed_mentions=discord.AllowedMentions(users=True, roles=False, everyone=False)
+        )
+
+
+# Global singleton instance
+ticket_sweeper = TicketSweeper()
@@ -1,41 +1,600 @@
 import discord
+import asyncio
+import gzip
+import hashlib
 import io
+import json
+import os
+import tempfile
+import threading
+import time
 from datetime import datetime
+from typing import Dict, List, Optional
 import config
+from utilities.TranscriptRenderer import RENDERERS, TextRenderer
+from utilities.TranscriptIndex import transcript_index
+from utilities.AttachmentArchiver import AttachmentArchiver
+from utilities.TicketRegistry import ticket_registry
+from utilities.TicketStore import ticket_store, save_ticket
+from utilities.TicketMetrics import ticket_metrics
 
-async def generate_transcript(channel):
-    """Generate a transcript of a ticket channel"""
-    transcript_content = f"Generated by SereneEnterprise, all rights reserved (c) (Taken from Waterstone Academy)\n"
-    transcript_content += f"Transcript for {channel.name}\n"
-    transcript_content += f"Generated on: {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')} UTC\n"
-    transcript_content += "=" * 50 + "\n\n"
-    
-    async for message in channel.history(limit=None, oldest_first=True):
-        timestamp = message.created_at.strftime('%Y-%m-%d %H:%M:%S')
-        author = f"{message.author.display_name} ({message.author})"
-        content = message.content if message.content else "[No text content]"
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Transcripts are kept in memory up to this size, then spill to a temporary file
+TRANSCRIPT_SPOOL_MAX_SIZE = 4 * 1024 * 1024
+
+# Upload limits - DMs get the base limit, and each message leaves room for the multipart overhead,
+# since the limit covers the whole request rather than each file
+DEFAULT_FILESIZE_LIMIT = 10 * 1024 * 1024
+ARCHIVE_PART_OVERHEAD = 64 * 1024
+MAX_FILES_PER_MESSAGE = 10
+COMPRESSION_CHUNK_SIZE = 64 * 1024
+
+# Records are handed to the renderer one history page at a time
+RENDER_BATCH_SIZE = 100
+
+class _SpoolReader(io.RawIOBase):
+    """Read-only view over a shared spool with its own position, so several uploads can read it at once"""
+    
+    def __init__(self, spool, lock, size: int, start: int = 0):
+        self._spool = spool
+        self._lock = lock
+        self._start = start
+        self._size = size
+        self._pos = 0
+    
+    def readable(self) -> bool:
+        return True
+    
+    def seekable(self) -> bool:
+        return True
+    
+    def tell(self) -> int:
+        return self._pos
+    
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += self._size
+        self._pos = max(0, min(offset, self._size))
+        return self._pos
+    
+    def readinto(self, buffer) -> int:
+        # Uploads may read from a worker thread, so the shared spool position is guarded
+        with self._lock:
+            self._spool.seek(self._start + self._pos)
+            data = self._spool.read(min(len(buffer), self._size - self._pos))
+        buffer[:len(data)] = data
+        self._pos += len(data)
+        return len(data)
+
+class Transcript:
+    """A ticket transcript captured once, which can be attached any number of times"""
+    
+    __slots__ = ('_filename', '_spool', '_lock', '_size', '_open_reason', '_search_spool')
+    
+    def __init__(self, filename: str, spool, open_reason: str = None, search_spool=None):
+        self._filename = filename
+        self._spool = spool
+        self._lock = threading.Lock()
+        self._size = spool.tell()
+        self._open_reason = open_reason
+        self._search_spool = search_spool
+    
+    @property
+    def filename(self) -> str:
+        return self._filename
+    
+    @property
+    def open_reason(self) -> str:
+        return self._open_reason
+    
+    @property
+    def size(self) -> int:
+        return self._size
+    
+    def open_reader(self, start: int = 0, length: Optional[int] = None) -> io.RawIOBase:
+        """Open an independent reader over all or part of the spool"""
+        length = self._size - start if length is None else min(length, self._size - start)
+        return _SpoolReader(self._spool, self._lock, length, start)
+    
+    def to_file(self, filename: str = None, start: int = 0, length: Optional[int] = None) -> discord.File:
+        """Create a new discord.File reading straight from the spool"""
+        return discord.File(self.open_reader(start, length), filename=filename or self._filename)
+    
+    def read_search_text(self) -> str:
+        """Read the plain message text collected for the search index - blocks, so run it in a worker thread"""
+        if self._search_spool is None:
+            return ""
+        self._search_spool.seek(0)
+        return self._search_spool.read().decode('utf-8')
+    
+    def close(self):
+        """Release the spool (and its temporary file if it spilled to disk)"""
+        self._spool.close()
+        if self._search_spool is not None:
+            self._search_spool.close()
+
+class TranscriptWriter:
+    """Streams encoded transcript text into a spool as it is produced"""
+    
+    def __init__(self):
+        self._spool = tempfile.SpooledTemporaryFile(max_size=TRANSCRIPT_SPOOL_MAX_SIZE, mode='w+b')
+    
+    def write(self, text: str):
+        self._spool.write(text.encode('utf-8'))
+    
+    def finish(self, filename: str, open_reason: str = None, search_writer: "TranscriptWriter" = None) -> Transcript:
+        """Seal the spool into a Transcript"""
+        return Transcript(filename, self._spool, open_reason, search_writer._spool if search_writer else None)
+
+class TranscriptArchive:
+    """The files a transcript is uploaded as - plain, compressed, or compressed and split into parts"""
+    
+    def __init__(self, transcript: Transcript, parts: List[tuple] = None, index: bytes = None, owned: bool = False,
+                 message_budget: Optional[int] = None):
+        self.transcript = transcript
+        self.parts = parts or []  # [(filename, start, length)]
+        self.index = index
+        self.message_budget = message_budget  # Most bytes of files sent in one message
+        self._owned = owned
+    
+    @property
+    def file_count(self) -> int:
+        return len(self.parts) + 1 if self.parts else 1
+    
+    def to_files(self) -> List[discord.File]:
+        """Create fresh discord.File objects for one destination"""
+        if not self.parts:
+            return [self.transcript.to_file()]
         
-        # Handle embeds
-        if message.embeds:
-            for embed in message.embeds:
-                if embed.title:
-                    content += f"\n[EMBED] {embed.title}"
-                if embed.description:
-                    content += f"\n{embed.description}"
+        files = [discord.File(io.BytesIO(self.index), filename=f"{self.transcript.filename}.index.txt")]
+        for filename, start, length in self.parts:
+            files.append(self.transcript.to_file(filename, start, length))
+        return files
+    
+    def _file_sizes(self) -> List[int]:
+        if not self.parts:
+            return [self.transcript.size]
+        sizes = [len(self.index)]
+        for _, start, length in self.parts:
+            sizes.append(min(length, self.transcript.size - start))
+        return sizes
+    
+    def to_batches(self) -> List[List[discord.File]]:
+        """Create fresh discord.File objects grouped into messages that each stay under the upload limit"""
+        batches = []
+        batch_size = 0
+        for file, size in zip(self.to_files(), self._file_sizes()):
+            over_budget = self.message_budget is not None and batch_size + size > self.message_budget
+            if not batches or over_budget or len(batches[-1]) >= MAX_FILES_PER_MESSAGE:
+                batches.append([])
+                batch_size = 0
+            batches[-1].append(file)
+            batch_size += size
+        return batches
+    
+    def close(self):
+        """Release the compressed spool if this archive created one"""
+        if self._owned:
+            self.transcript.close()
+
+def _compress_transcript(transcript: Transcript, method: str) -> Transcript:
+    """Compress a transcript into a new spool - runs in a worker thread"""
+    spool = tempfile.SpooledTemporaryFile(max_size=TRANSCRIPT_SPOOL_MAX_SIZE, mode='w+b')
+    if method == "zstd":
+        compressor = zstandard.ZstdCompressor().stream_writer(spool, closefd=False)
+        extension = ".zst"
+    else:
+        compressor = gzip.GzipFile(filename=transcript.filename, mode='wb', fileobj=spool)
+        extension = ".gz"
+    
+    reader = transcript.open_reader()
+    while True:
+        chunk = reader.read(COMPRESSION_CHUNK_SIZE)
+        if not chunk:
+            break
+        compressor.write(chunk)
+    compressor.close()
+    
+    return Transcript(transcript.filename + extension, spool, transcript.open_reason)
+
+def _hash_transcript(transcript: Transcript) -> str:
+    """Get the SHA-256 of a transcript's bytes - runs in a worker thread"""
+    digest = hashlib.sha256()
+    reader = transcript.open_reader()
+    while True:
+        chunk = reader.read(COMPRESSION_CHUNK_SIZE)
+        if not chunk:
+            break
+        digest.update(chunk)
+    return digest.hexdigest()
+
+async def prepare_archive(transcript: Transcript, size_limit: int, compress: bool = True) -> TranscriptArchive:
+    """Compress and split a transcript as needed to fit the upload limit"""
+    part_size = size_limit - ARCHIVE_PART_OVERHEAD
+    if transcript.size <= part_size and (not compress or config.TICKET_TRANSCRIPT_ARCHIVE != "always"):
+        return TranscriptArchive(transcript)
+    
+    if compress:
+        method = config.TICKET_TRANSCRIPT_COMPRESSION
+        if method == "zstd" and zstandard is None:
+            print("zstandard is not installed, compressing transcript with gzip")
+            method = "gzip"
         
-        # Handle attachments
-        if message.attachments:
-            for attachment in message.attachments:
-                content += f"\n[ATTACHMENT] {attachment.filename}"
+        # Compression runs in a worker thread so the event loop keeps serving
+        compressed = await asyncio.to_thread(_compress_transcript, transcript, method)
+        if compressed.size <= part_size:
+            return TranscriptArchive(compressed, owned=True)
+    else:
+        method = "uncompressed"
+        compressed = transcript
+    
+    part_count = (compressed.size + part_size - 1) // part_size
+    parts = [
+        (f"{compressed.filename}.part{number + 1:03d}", number * part_size, part_size)
+        for number in range(part_count)
+    ]
+    
+    checksum = await asyncio.to_thread(_hash_transcript, compressed)
+    index_lines = [
+        f"Transcript archive: {compressed.filename}\n",
+        f"Original size: {transcript.size} bytes\n",
+        f"Compressed size: {compressed.size} bytes ({method})\n",
+        f"SHA-256: {checksum}\n",
+        f"Parts: {part_count}\n\n",
+        "Join the parts in order to restore the archive, e.g.\n",
+        f"cat {compressed.filename}.part* > {compressed.filename}\n\n"
+    ]
+    for filename, start, length in parts:
+        index_lines.append(f"{filename}  {min(length, compressed.size - start)} bytes\n")
+    
+    return TranscriptArchive(compressed, parts, "".join(index_lines).encode('utf-8'), owned=compress,
+                             message_budget=part_size)
+
+async def _send_archive(destination, embed: discord.Embed, archive: TranscriptArchive) -> discord.Message:
+    """Send an archive, spreading its files over as many messages as needed, and return the first message"""
+    first_message = None
+    for batch in archive.to_batches():
+        if first_message is None:
+            first_message = await destination.send(embed=embed, files=batch)
+        else:
+            await destination.send(files=batch)
+    return first_message
+
+def _embed_record(embed) -> dict:
+    """Reduce an embed to the fields a transcript needs"""
+    return {
+        'title': embed.title,
+        'description': embed.description,
+        'url': embed.url,
+        'color': embed.color.value if embed.color else None,
+        'fields': [{'name': field.name, 'value': field.value} for field in embed.fields],
+        'image': embed.image.url if embed.image else None,
+        'footer': embed.footer.text if embed.footer else None
+    }
+
+def _message_record(message) -> dict:
+    """Reduce a message to the fields a transcript needs"""
+    mentions = {f"@{user.id}": user.display_name for user in message.mentions}
+    mentions.update({f"@&{role.id}": role.name for role in message.role_mentions})
+    mentions.update({f"#{channel.id}": channel.name for channel in message.channel_mentions})
+    
+    return {
+        'id': message.id,
+        'timestamp': message.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+        'edited_at': message.edited_at.strftime('%Y-%m-%d %H:%M:%S') if message.edited_at else None,
+        'author': f"{message.author.display_name} ({message.author})",
+        'content': message.content,
+        'mentions': mentions,
+        'embeds': [_embed_record(embed) for embed in message.embeds],
+        'attachments': [
+            {
+                'id': attachment.id,
+                'filename': attachment.filename,
+                'url': attachment.url,
+                'size': attachment.size
+            }
+            for attachment in message.attachments
+        ]
+    }
+
+def _collect_search_text(search_writer: TranscriptWriter, records: List[dict]):
+    """Append the searchable text of each record"""
+    for record in records:
+        parts = [record['content'] or ""]
+        for embed in record['embeds']:
+            parts.append(embed.get('title') or "")
+            parts.append(embed.get('description') or "")
+        text = " ".join(part for part in parts if part)
+        if text:
+            search_writer.write(text + "\n")
+
+def _render_batch(renderer, search_writer: TranscriptWriter, records: List[dict]):
+    """Render a batch of records and collect their search text - runs in a worker thread"""
+    renderer.render(records)
+    _collect_search_text(search_writer, records)
+
+def _find_open_reason(record: dict):
+    """Get the opening reason from a message record's embeds, if it has one"""
+    for embed in record['embeds']:
+        if embed.get('description') and "**Reason**:" in embed['description']:
+            # Extract reason from description
+            for line in embed['description'].split('\n'):
+                if line.startswith("**Reason**:"):
+                    reason = line.replace("**Reason**:", "").strip()
+                    return reason if reason else "No reason provided"
+    return None
+
+# Live ticket logs (opt-in): channel_id -> id of the newest message appended to its log
+LIVE_LOGS: Dict[int, int] = {}
+LIVE_LOG_DIR = os.path.join(config.DATA_DIR, "ticket_logs")
+
+# Log entries are buffered and written in a worker thread at most this often
+LIVE_LOG_FLUSH_SECONDS = 1
+
+_live_log_buffer: Dict[int, List[str]] = {}  # channel_id: encoded entries not yet written
+_live_log_file_lock = threading.Lock()
+_live_log_flush_lock = asyncio.Lock()
+_live_log_flush_task = None
+_live_log_catch_up_task = None
+
+def _live_log_path(channel_id: int) -> str:
+    return os.path.join(LIVE_LOG_DIR, f"{channel_id}.jsonl")
+
+def _append_live_log(channel_id: int, entry: dict):
+    """Buffer a log entry and make sure a flush is on its way"""
+    global _live_log_flush_task
+    _live_log_buffer.setdefault(channel_id, []).append(json.dumps(entry) + "\n")
+    if _live_log_flush_task is None or _live_log_flush_task.done():
+        _live_log_flush_task = asyncio.create_task(_flush_live_logs_later())
+
+def _write_live_logs(pending: Dict[int, List[str]]):
+    """Append buffered entries to their logs, one open per ticket - runs in a worker thread"""
+    with _live_log_file_lock:
+        for channel_id, lines in pending.items():
+            # Skip logs discarded since the entries were buffered
+            if channel_id not in LIVE_LOGS:
+                continue
+            with open(_live_log_path(channel_id), 'a', encoding='utf-8') as log_file:
+                log_file.writelines(lines)
+
+async def _flush_live_logs_later():
+    await asyncio.sleep(LIVE_LOG_FLUSH_SECONDS)
+    await flush_live_logs()
+
+async def flush_live_logs():
+    """Write every buffered log entry to disk"""
+    async with _live_log_flush_lock:
+        pending = dict(_live_log_buffer)
+        _live_log_buffer.clear()
+        if not pending:
+            return
+        try:
+            await asyncio.to_thread(_write_live_logs, pending)
+        except Exception as e:
+            print(f"Error writing ticket logs: {e}")
+
+def load_live_logs():
+    """Find the live logs left by a previous run and the newest message each one holds"""
+    if not config.TICKET_LIVE_TRANSCRIPTS:
+        return
+    
+    os.makedirs(LIVE_LOG_DIR, exist_ok=True)
+    for filename in os.listdir(LIVE_LOG_DIR):
+        if not filename.endswith(".jsonl"):
+            continue
+        channel_id = int(filename[:-len(".jsonl")])
+        last_id = 0
+        with open(os.path.join(LIVE_LOG_DIR, filename), 'r', encoding='utf-8') as log_file:
+            for line in log_file:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if entry.get('op') == 'message':
+                    last_id = max(last_id, entry['id'])
+        LIVE_LOGS[channel_id] = last_id
+
+def start_live_log(channel):
+    """Start a live log for a newly created ticket channel"""
+    if not config.TICKET_LIVE_TRANSCRIPTS:
+        return
+    
+    os.makedirs(LIVE_LOG_DIR, exist_ok=True)
+    open(_live_log_path(channel.id), 'a', encoding='utf-8').close()
+    LIVE_LOGS[channel.id] = 0
+
+def start_live_logs(bot):
+    """Pick up the live logs left by a previous run and catch them up - only the first call counts,
+    since on_ready fires again on every reconnect"""
+    global _live_log_catch_up_task
+    if not config.TICKET_LIVE_TRANSCRIPTS or _live_log_catch_up_task is not None:
+        return
+    load_live_logs()
+    _live_log_catch_up_task = asyncio.create_task(catch_up_live_logs(bot))
+
+def discard_live_log(channel_id: int):
+    """Remove a ticket's live log once its transcript has been sent"""
+    if LIVE_LOGS.pop(channel_id, None) is not None:
+        _live_log_buffer.pop(channel_id, None)
+        with _live_log_file_lock:
+            try:
+                os.remove(_live_log_path(channel_id))
+            except OSError:
+                pass
+
+def record_live_message(message):
+    """Append a new message to its ticket's live log - call this from on_message"""
+    if message.channel.id not in LIVE_LOGS:
+        return
+    entry = _message_record(message)
+    entry['op'] = 'message'
+    _append_live_log(message.channel.id, entry)
+    LIVE_LOGS[message.channel.id] = max(LIVE_LOGS[message.channel.id], message.id)
+
+def record_live_edit(payload):
+    """Append an edit to its ticket's live log - call this from on_raw_message_edit, so edits to
+    messages that aren't cached are logged too"""
+    if payload.channel_id not in LIVE_LOGS:
+        return
+    
+    message = getattr(payload, 'message', None)
+    if message is not None:
+        entry = _message_record(message)
+    else:
+        # Older discord.py only gives the raw data, which holds just the changed fields
+        data = payload.data
+        entry = {'id': payload.message_id}
+        if 'content' in data:
+            entry['content'] = data['content']
+        if data.get('edited_timestamp'):
+            edited_at = datetime.fromisoformat(data['edited_timestamp'])
+            entry['edited_at'] = edited_at.strftime('%Y-%m-%d %H:%M:%S')
+        if 'embeds' in data:
+            entry['embeds'] = [_embed_record(discord.Embed.from_dict(embed)) for embed in data['embeds']]
+    entry['op'] = 'edit'
+    _append_live_log(payload.channel_id, entry)
+
+def record_live_delete(channel_id: int, message_id: int):
+    """Append a delete to its ticket's live log - call this from on_raw_message_delete"""
+    if channel_id not in LIVE_LOGS:
+        return
+    _append_live_log(channel_id, {'op': 'delete', 'id': message_id})
+
+async def catch_up_live_log(channel):
+    """Append messages sent while the bot was offline, normally a single empty history page"""
+    last_id = LIVE_LOGS.get(channel.id)
+    if last_id is None:
+        return
+    
+    after = discord.Object(id=last_id) if last_id else None
+    async for message in channel.history(limit=None, after=after, oldest_first=True):
+        record_live_message(message)
+
+async def catch_up_live_logs(bot):
+    """Catch up every live log after a restart"""
+    for channel_id in list(LIVE_LOGS):
+        channel = bot.get_channel(channel_id)
+        if channel is None:
+            # The ticket was deleted while the bot was offline
+            discard_live_log(channel_id)
+            continue
+        try:
+            await catch_up_live_log(channel)
+        except Exception as e:
+            print(f"Error catching up ticket log for {channel_id}: {e}")
+
+def _replay_live_log(channel_id: int) -> List[dict]:
+    """Replay a live log into message records in posting order"""
+    records: Dict[int, dict] = {}
+    with open(_live_log_path(channel_id), 'r', encoding='utf-8') as log_file:
+        for line in log_file:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            
+            op = entry.pop('op', None)
+            record = records.get(entry['id'])
+            if op == 'message' and record is None:
+                records[entry['id']] = entry
+            elif op == 'edit' and record is not None:
+                if 'content' in entry and entry['content'] != record.get('content'):
+                    revisions = record.pop('revisions', [])
+                    revisions.append({'content': record.get('content'), 'edited_at': record.get('edited_at')})
+                    entry['revisions'] = revisions
+                record.update(entry)
+                record['edited'] = True
+            elif op == 'delete' and record is not None:
+                record['deleted'] = True
+    return sorted(records.values(), key=lambda record: record['id'])
+
+async def _refresh_attachment_urls(channel, records: List[dict]):
+    """Swap the attachment URLs saved in a live log for fresh ones - the signed CDN links expire after
+    about a day, long before most tickets close"""
+    semaphore = asyncio.Semaphore(int(config.TICKET_ATTACHMENT_CONCURRENCY))
+    
+    async def refresh(record):
+        async with semaphore:
+            try:
+                message = await channel.fetch_message(record['id'])
+            except discord.HTTPException:
+                # Deleted messages lose their attachments, so the saved links are all there is
+                return
+        urls = {attachment.id: attachment.url for attachment in message.attachments}
+        for attachment in record['attachments']:
+            if isinstance(attachment, dict) and attachment['id'] in urls:
+                attachment['url'] = urls[attachment['id']]
+    
+    await asyncio.gather(*(
+        refresh(record) for record in records
+        if record['attachments'] and not record.get('deleted')
+    ))
+
+async def capture_transcript(channel, archiver: AttachmentArchiver = None) -> Transcript:
+    """Capture the transcript from the live log if there is one, otherwise walk the history once"""
+    renderer_class = RENDERERS.get(config.TICKET_TRANSCRIPT_FORMAT, TextRenderer)
+    writer = TranscriptWriter()
+    search_writer = TranscriptWriter()
+    renderer = renderer_class(writer, channel.name)
+    open_reason = None
+    
+    async def process(records):
+        # Archive first so the attachment hashes make it into the transcript
+        if archiver:
+            await archiver.archive(records)
+        await asyncio.to_thread(_render_batch, renderer, search_writer, records)
+    
+    # Rendering runs in a worker thread, one history page at a time, so big tickets don't block interactions
+    await asyncio.to_thread(renderer.start)
+    
+    if channel.id in LIVE_LOGS:
+        await catch_up_live_log(channel)
+        await flush_live_logs()
+        records = await asyncio.to_thread(_replay_live_log, channel.id)
+        for record in records:
+            if record['embeds']:
+                open_reason = _find_open_reason(record)
+                if open_reason:
+                    break
+        if archiver:
+            await _refresh_attachment_urls(channel, records)
+        await process(records)
+    else:
+        batch = []
+        async for message in channel.history(limit=None, oldest_first=True):
+            record = _message_record(message)
+            if open_reason is None and record['embeds']:
+                open_reason = _find_open_reason(record)
+            batch.append(record)
+            
+            if len(batch) >= RENDER_BATCH_SIZE:
+                await process(batch)
+                batch = []
         
-        transcript_content += f"[{timestamp}] {author}: {content}\n"
+        if batch:
+            await process(batch)
     
-    # Create a file-like object
-    transcript_file = io.BytesIO(transcript_content.encode('utf-8'))
-    return discord.File(transcript_file, filename=f"{channel.name}-transcript.txt")
+    await asyncio.to_thread(renderer.finish)
+    return writer.finish(f"{channel.name}-transcript.{renderer.extension}", open_reason, search_writer)
 
-async def send_transcript(channel, closed_by, close_reason=None, open_reason=None):
-    """Generate and send transcript to user and transcript channel"""
+async def generate_transcript(channel):
+    """Generate a transcript of a ticket channel"""
+    transcript = await capture_transcript(channel)
+    return transcript.to_file()
+
+async def send_transcript(channel, closed_by, close_reason=None, open_reason=None, timings: Dict[str, float] = None):
+    """Generate the transcript once and send it to the transcript channel and ticket creator concurrently"""
+    if timings is None:
+        timings = {}
+    transcript = None
+    archive = None
+    archiver = AttachmentArchiver() if config.TICKET_ARCHIVE_ATTACHMENTS else None
     try:
         # Get ticket owner and claimed info
         ticket_owner, claimed_by = get_ticket_info_from_channel(channel)
@@ -44,9 +603,21 @@ async def send_transcript(channel, closed_by, close_reason=None, open_reason=Non
         print(f"Ticket owner found: {ticket_owner}")
         print(f"Claimed by: {claimed_by}")
         
-        # Extract open reason from channel history if not provided
+        # Capture the history once for every destination
+        stage_started = time.perf_counter()
+        transcript = await capture_transcript(channel, archiver)
+        timings['capture'] = time.perf_counter() - stage_started
+        
+        # Both destinations share one archive, so it has to fit the smaller (DM) limit
+        stage_started = time.perf_counter()
+        size_limit = min(channel.guild.filesize_limit, DEFAULT_FILESIZE_LIMIT)
+        archive = await prepare_archive(transcript, size_limit)
+        timings['archive'] = time.perf_counter() - stage_started
+        
+        # Use the open reason recorded at creation, or found in the transcript, if not provided
         if not open_reason:
-            open_reason = await extract_open_reason(channel)
+            ticket = ticket_registry.get(channel.id)
+            open_reason = (ticket and ticket['open_reason']) or transcript.open_reason
         
         # Default reasons if still not provided
         if not close_reason:
@@ -54,10 +625,39 @@ async def send_transcript(channel, closed_by, close_reason=None, open_reason=Non
         if not open_reason:
             open_reason = "No reason provided"
         
-        # Send to transcript channel
-        if config.TICKET_TRANSCRIPT_ID:
-            transcript_channel = channel.guild.get_channel(int(config.TICKET_TRANSCRIPT_ID))
-            if transcript_channel:
+        # Every upload opens its own readers over the same archive, so they can run side by side
+        await asyncio.gather(
+            _publish_transcript(channel, closed_by, ticket_owner, claimed_by, open_reason, close_reason,
+                                transcript, archive, archiver, timings),
+            _send_transcript_to_owner(channel, closed_by, ticket_owner, claimed_by, open_reason, close_reason,
+                                      archive, timings)
+        )
+    
+    except Exception as e:
+        print(f"Error generating/sending transcript: {e}")
+        import traceback
+        traceback.print_exc()
+    
+    finally:
+        if archiver:
+            await archiver.close()
+        if archive:
+            archive.close()
+        if transcript:
+            transcript.close()
+        discard_live_log(channel.id)
+
+async def _publish_transcript(channel, closed_by, ticket_owner, claimed_by, open_reason, close_reason,
+                              transcript: Transcript, archive: TranscriptArchive, archiver, timings: Dict[str, float]):
+    """Send the transcript to the transcript channel, then index it"""
+    archive_message = None
+    
+    # Send to transcript channel
+    if config.TICKET_TRANSCRIPT_ID:
+        transcript_channel = channel.guild.get_channel(int(config.TICKET_TRANSCRIPT_ID))
+        if transcript_channel:
+            stage_started = time.perf_counter()
+            try:
                 embed = discord.Embed(
                     title="<:People:1446847702804598886>  Waterstone Support",
                     description=f"Transcript for **{channel.name}**",
@@ -72,104 +672,124 @@ async def send_transcript(channel, closed_by, close_reason=None, open_reason=Non
                 embed.add_field(name="Close Reason", value=close_reason, inline=True)
                 embed.set_image(url="https://media.discordapp.net/attachments/1353870922712354900/1437239861802303628/WSALine.png?ex=693423ad&is=6932d22d&hm=96f2ac4bdc5294f7109fc750e3225b22e73dfef514ce605c545e6dadb26ebdb4&=&format=webp&quality=lossless")
                 
-                # Generate transcript for the channel
-                transcript_file_copy = await generate_transcript(channel)
-                await transcript_channel.send(embed=embed, file=transcript_file_copy)
+                archive_message = await _send_archive(transcript_channel, embed, archive)
                 print(f"Transcript sent to transcript channel")
-        
-        # Send to ticket creator via DM
-        if ticket_owner:
-            try:
-                print(f"Attempting to send DM to {ticket_owner.name}...")
-                dm_embed = discord.Embed(
-                    title="<:People:1446847702804598886>  Your Ticket Has Been Closed",
-                    color=0x2B2D31,
-                    timestamp=datetime.utcnow()
-                )
-                dm_embed.add_field(name="Server", value=channel.guild.name, inline=True)
-                dm_embed.add_field(name="Closed By", value=closed_by.display_name, inline=True)
-                dm_embed.add_field(name="Channel", value=channel.name, inline=True)
-                dm_embed.add_field(name="Claimed By", value=claimed_by if claimed_by else "Unclaimed", inline=True)
-                dm_embed.add_field(name="Open Reason", value=open_reason, inline=True)
-                dm_embed.add_field(name="Close Reason", value=close_reason, inline=True)
-                dm_embed.set_image(url="https://media.discordapp.net/attachments/1353870922712354900/1437239861802303628/WSALine.png?ex=693423ad&is=6932d22d&hm=96f2ac4bdc5294f7109fc750e3225b22e73dfef514ce605c545e6dadb26ebdb4&=&format=webp&quality=lossless")
                 
-                # Create another copy for DM
-                transcript_file_dm = await generate_transcript(channel)
-                await ticket_owner.send(embed=dm_embed, file=transcript_file_dm)
-                print(f"Successfully sent transcript to {ticket_owner.name}")
-            except discord.Forbidden:
-                print(f"Cannot send DM to {ticket_owner.name} - DMs disabled")
+                # Bundle the archived attachments alongside the transcript
+                if archiver and archiver.manifest:
+                    await _send_attachment_bundle(transcript_channel, channel, archiver)
             except Exception as e:
-                print(f"Error sending transcript to user: {e}")
-        else:
-            print("No ticket owner found - cannot send DM")
+                print(f"Error sending transcript to transcript channel: {e}")
+            timings['transcript_channel'] = time.perf_counter() - stage_started
     
+    # Index the ticket so it can be found with /ticket search
+    stage_started = time.perf_counter()
+    try:
+        search_text = await asyncio.to_thread(transcript.read_search_text)
+        await asyncio.to_thread(
+            transcript_index.add,
+            channel.id,
+            channel.name,
+            ticket_owner.id if ticket_owner else None,
+            str(ticket_owner) if ticket_owner else "Unknown",
+            closed_by.id,
+            str(closed_by),
+            claimed_by or "Unclaimed",
+            open_reason,
+            close_reason,
+            search_text,
+            archive_message.jump_url if archive_message else None
+        )
     except Exception as e:
-        print(f"Error generating/sending transcript: {e}")
-        import traceback
-        traceback.print_exc()
+        print(f"Error indexing transcript: {e}")
+    timings['index'] = time.perf_counter() - stage_started
 
-async def extract_open_reason(channel):
-    """Extract the opening reason from the ticket channel's history"""
+async def _send_transcript_to_owner(channel, closed_by, ticket_owner, claimed_by, open_reason, close_reason,
+                                    archive: TranscriptArchive, timings: Dict[str, float]):
+    """DM the transcript to the ticket creator"""
+    if not ticket_owner:
+        print("No ticket owner found - cannot send DM")
+        return
+    
+    stage_started = time.perf_counter()
     try:
-        async for message in channel.history(limit=50, oldest_first=True):
-            # Look for the embed that contains "Reason:" field
-            if message.embeds:
-                for embed in message.embeds:
-                    if embed.description and "**Reason**:" in embed.description:
-                        # Extract reason from description
-                        lines = embed.description.split('\n')
-                        for line in lines:
-                            if line.startswith("**Reason**:"):
-                                reason = line.replace("**Reason**:", "").strip()
-                                return reason if reason else "No reason provided"
-        return "No reason provided"
+        print(f"Attempting to send DM to {ticket_owner.name}...")
+        dm_embed = discord.Embed(
+            title="<:People:1446847702804598886>  Your Ticket Has Been Closed",
+            color=0x2B2D31,
+            timestamp=datetime.utcnow()
+        )
+        dm_embed.add_field(name="Server", value=channel.guild.name, inline=True)
+        dm_embed.add_field(name="Closed By", value=closed_by.display_name, inline=True)
+        dm_embed.add_field(name="Channel", value=channel.name, inline=True)
+        dm_embed.add_field(name="Claimed By", value=claimed_by if claimed_by else "Unclaimed", inline=True)
+        dm_embed.add_field(name="Open Reason", value=open_reason, inline=True)
+        dm_embed.add_field(name="Close Reason", value=close_reason, inline=True)
+        dm_embed.set_image(url="https://media.discordapp.net/attachments/1353870922712354900/1437239861802303628/WSALine.png?ex=693423ad&is=6932d22d&hm=96f2ac4bdc5294f7109fc750e3225b22e73dfef514ce605c545e6dadb26ebdb4&=&format=webp&quality=lossless")
+        
+        await _send_archive(ticket_owner, dm_embed, archive)
+        print(f"Successfully sent transcript to {ticket_owner.name}")
+    except discord.Forbidden:
+        print(f"Cannot send DM to {ticket_owner.name} - DMs disabled")
     except Exception as e:
-        print(f"Error extracting open reason: {e}")
-        return "No reason provided"
+        print(f"Error sending transcript to user: {e}")
+    timings['dm'] = time.perf_counter() - stage_started
 
-def get_ticket_info_from_channel(channel):
-    """Extract ticket information from channel name and topic"""
-    ticket_owner = None
-    claimed_by = None
-    
-    # Method 1: Check channel topic for user ID (most reliable)
-    if channel.topic:
-        # Look for user mentions in topic
-        if channel.topic.startswith("<@") and ">" in channel.topic:
-            user_id = channel.topic.split(">")[0].replace("<@", "").replace("!", "")
-            try:
-                ticket_owner = channel.guild.get_member(int(user_id))
-            except:
-                pass
+async def close_ticket(channel, closed_by, close_reason=None):
+    """Send the transcript and delete the ticket as soon as every upload has finished"""
+    timings = {}
+    started = time.perf_counter()
+    await send_transcript(channel, closed_by, close_reason=close_reason, timings=timings)
+    
+    ticket = ticket_registry.get(channel.id)
+    record = await save_ticket(ticket_store.close, channel.id, closed_by.id, close_reason or "No reason provided")
+    if ticket is not None:
+        ticket_registry.remove(channel.id)
+        ticket_metrics.record_close(record, bool(ticket['claimed_by']))
+    
+    stage_started = time.perf_counter()
+    await channel.delete(reason=f"Ticket closed by {closed_by} - {close_reason or 'No reason provided'}")
+    timings['delete'] = time.perf_counter() - stage_started
+    timings['total'] = time.perf_counter() - started
+    
+    breakdown = ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in timings.items())
+    print(f"Closed {channel.name}: {breakdown}")
+
+async def _send_attachment_bundle(transcript_channel, channel, archiver: AttachmentArchiver):
+    """Upload the zipped attachments and manifest of a ticket"""
+    bundle = None
+    bundle_archive = None
+    try:
+        spool = await asyncio.to_thread(archiver.build_bundle)
+        bundle = Transcript(f"{channel.name}-attachments.zip", spool)
+        size_limit = min(channel.guild.filesize_limit, DEFAULT_FILESIZE_LIMIT)
+        bundle_archive = await prepare_archive(bundle, size_limit, compress=False)
         
-        # Get claimed info from topic
-        if "Claimed by:" in channel.topic:
-            claimed_by = channel.topic.split("Claimed by:")[-1].strip()
+        skipped = sum(1 for entry in archiver.manifest if entry['status'] != "archived")
+        embed = discord.Embed(
+            title="<:People:1446847702804598886>  Waterstone Support",
+            description=(
+                f"Attachments for **{channel.name}**\n"
+                f"**Archived**: {len(archiver.manifest) - skipped} ({len(archiver.archived)} unique)\n"
+                f"**Skipped**: {skipped}"
+            ),
+            color=None
+        )
+        await _send_archive(transcript_channel, embed, bundle_archive)
+    except Exception as e:
+        print(f"Error sending attachment bundle: {e}")
+    finally:
+        if bundle_archive:
+            bundle_archive.close()
+        if bundle:
+            bundle.close()
+
+def get_ticket_info_from_channel(channel):
+    """Look up a ticket's owner and claimer in the registry"""
+    ticket = ticket_registry.get(channel.id)
+    if ticket is None:
+        # Not seen since startup - rebuild from the topic and overwrites
+        ticket = ticket_registry.register_from_channel(channel)
     
-    # Method 2: Check channel permissions (backup method)
-    if not ticket_owner:
-        for member in channel.members:
-            # Look for a member who has special permissions but isn't a bot
-            if not member.bot:
-                perms = channel.permissions_for(member)
-                # Check if they have read permissions (ticket owner should have this)
-                if perms.read_messages and perms.send_messages:
-                    # Check if they're not a staff member (you might need to adjust this logic)
-                    staff_roles = ["Staff", "Admin", "Moderator", "Support"]  # Adjust these role names
-                    is_staff = any(role.name in staff_roles for role in member.roles)
-                    if not is_staff:
-                        ticket_owner = member
-                        break
-    
-    # Method 3: Try to extract from channel name (least reliable)
-    if not ticket_owner and channel.name.startswith("ticket-"):
-        owner_name = channel.name.replace("ticket-", "").lower()
-        # Try to find the user
-        for member in channel.guild.members:
-            if member.name.lower() == owner_name or member.display_name.lower() == owner_name:
-                ticket_owner = member
-                break
-    
-    return ticket_owner, claimed_by
\ No newline at end of file
+    ticket_owner = channel.guild.get_member(ticket['owner_id']) if ticket['owner_id'] else None
+    return ticket_owner, ticket['claimed_by']
\ No newline at end of file
@@ -0,0 +1,84 @@
+"""
+Transcript Index Module
+Local SQLite FTS5 full-text index over closed ticket transcripts
+"""
+
+import os
+from datetime import datetime
+from typing import List, Optional
+import config
+from utilities.SqliteStore import SqliteStore
+
+
+class TranscriptIndex(SqliteStore):
+    """Indexes closed tickets so staff can search them"""
+    
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS transcripts (
+            id INTEGER PRIMARY KEY,
+            channel_id INTEGER,
+            channel_name TEXT,
+            owner_id INTEGER,
+            owner_name TEXT,
+            closer_id INTEGER,
+            closer_name TEXT,
+            claimed_by TEXT,
+            open_reason TEXT,
+            close_reason TEXT,
+            closed_at TEXT,
+            jump_url TEXT
+        );
+        CREATE VIRTUAL TABLE IF NOT EXISTS transcripts_fts USING fts5(
+            channel_name, owner, closer, claimer, open_reason, close_reason, content
+        );
+    """
+    
+    def add(self, channel_id: int, channel_name: str, owner_id: Optional[int], owner_name: str,
+            closer_id: int, closer_name: str, claimed_by: str, open_reason: str,
+            close_reason: str, content: str, jump_url: Optional[str]) -> int:
+        """Index a closed ticket and return its row ID"""
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                cursor = conn.execute(
+                    """INSERT INTO transcripts (channel_id, channel_name, owner_id, owner_name, closer_id,
+                       closer_name, claimed_by, open_reason, close_reason, closed_at, jump_url)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                    (channel_id, channel_name, owner_id, owner_name, closer_id, closer_name, claimed_by,
+                     open_reason, close_reason, datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S'), jump_url)
+                )
+                conn.execute(
+                    """INSERT INTO transcripts_fts (rowid, channel_name, owner, closer, claimer,
+                       open_reason, close_reason, content) VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                    (cursor.lastrowid, channel_name, owner_name, closer_name, claimed_by,
+                     open_reason, close_reason, content)
+                )
+            return cursor.lastrowid
+    
+    @staticmethod
+    def _match_query(query: str) -> str:
+        """Quote every term so user input can't break the FTS5 query syntax"""
+        terms = [term.replace('"', '""') for term in query.split()]
+        return " ".join(f'"{term}"' for term in terms if term)
+    
+    def search(self, query: str, limit: int = 50, offset: int = 0) -> List[dict]:
+        """Search transcripts, best matches first (people and reasons weigh more than message text)"""
+        match_query = self._match_query(query)
+        if not match_query:
+            return []
+        
+        with self._lock:
+            rows = self._connect().execute(
+                """SELECT t.*, snippet(transcripts_fts, 6, '**', '**', '...', 12) AS snippet
+                   FROM transcripts_fts
+                   JOIN transcripts t ON t.id = transcripts_fts.rowid
+                   WHERE transcripts_fts MATCH ?
+                   ORDER BY bm25(transcripts_fts, 2.0, 5.0, 3.0, 3.0, 4.0, 4.0, 1.0)
+                   LIMIT ? OFFSET ?""",
+                (match_query, limit, offset)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+
+# Global singleton instance
+transcript_index = TranscriptIndex(os.path.join(config.DATA_DIR, "transcripts.db"))
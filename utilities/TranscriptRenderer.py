@@ -0,0 +1,235 @@
+"""
+Transcript Renderer Module
+Turns captured message records into plain text or self-contained HTML transcripts
+"""
+
+import html
+import re
+from datetime import datetime
+from typing import Dict, List
+
+# Matches user, role and channel mentions in raw message content
+MENTION_PATTERN = re.compile(r'<(@!?|@&|#)(\d+)>')
+
+HTML_STYLE = """
+body { background: #313338; color: #dbdee1; font-family: 'gg sans', 'Helvetica Neue', Arial, sans-serif; font-size: 15px; margin: 0; padding: 24px; }
+a { color: #00a8fc; }
+.header { border-bottom: 1px solid #3f4147; margin-bottom: 16px; padding-bottom: 12px; }
+.header h1 { color: #f2f3f5; font-size: 20px; margin: 0 0 4px 0; }
+.header p, .meta { color: #949ba4; font-size: 12px; margin: 0; }
+.message { border-bottom: 1px solid #2b2d31; padding: 8px 0; }
+.message.deleted { opacity: 0.6; }
+.author { color: #f2f3f5; font-weight: 600; margin-right: 6px; }
+.content { white-space: pre-wrap; word-wrap: break-word; margin-top: 2px; }
+.mention { background: #3c4270; border-radius: 3px; color: #c9cdfb; padding: 0 2px; }
+.tag { background: #4e5058; border-radius: 3px; color: #f2f3f5; font-size: 11px; margin-left: 6px; padding: 0 4px; }
+.embed { background: #2b2d31; border-left: 4px solid #1e1f22; border-radius: 4px; margin-top: 6px; max-width: 560px; padding: 8px 12px; }
+.embed-title { color: #f2f3f5; font-weight: 600; }
+.embed-field { margin-top: 6px; }
+.embed-field-name { color: #f2f3f5; font-size: 13px; font-weight: 600; }
+.attachment { background: #2b2d31; border: 1px solid #1e1f22; border-radius: 4px; display: inline-block; margin-top: 6px; padding: 6px 10px; }
+.hash { color: #949ba4; font-family: monospace; font-size: 11px; }
+details { color: #949ba4; font-size: 13px; margin-top: 4px; }
+table { border-collapse: collapse; margin-top: 8px; width: 100%; }
+th, td { border: 1px solid #3f4147; font-size: 13px; padding: 4px 8px; text-align: left; }
+"""
+
+
+def _attachment_name(attachment) -> str:
+    """Get an attachment's filename (older live logs stored just the name)"""
+    return attachment['filename'] if isinstance(attachment, dict) else attachment
+
+
+def _format_size(size: int) -> str:
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+class TextRenderer:
+    """Renders records as the plain text transcript"""
+    
+    extension = "txt"
+    
+    def __init__(self, writer, channel_name: str):
+        self.writer = writer
+        self.channel_name = channel_name
+    
+    def start(self):
+        self.writer.write(f"Generated by SereneEnterprise, all rights reserved (c) (Taken from Waterstone Academy)\n")
+        self.writer.write(f"Transcript for {self.channel_name}\n")
+        self.writer.write(f"Generated on: {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')} UTC\n")
+        self.writer.write("=" * 50 + "\n\n")
+    
+    def render(self, records: List[dict]):
+        for record in records:
+            self.writer.write(self.format_record(record))
+    
+    def finish(self):
+        pass
+    
+    @staticmethod
+    def format_record(record: dict) -> str:
+        """Format a single message record as a transcript line"""
+        content = record['content'] if record['content'] else "[No text content]"
+        
+        # Handle embeds
+        for embed in record['embeds']:
+            if embed.get('title'):
+                content += f"\n[EMBED] {embed['title']}"
+            if embed.get('description'):
+                content += f"\n{embed['description']}"
+        
+        # Handle attachments
+        for attachment in record['attachments']:
+            content += f"\n[ATTACHMENT] {_attachment_name(attachment)}"
+        
+        # Mark changes
+        if record.get('deleted'):
+            content = f"[DELETED] {content}"
+        elif record.get('edited') or record.get('edited_at'):
+            content += " (edited)"
+        
+        return f"[{record['timestamp']}] {record['author']}: {content}\n"
+
+
+class HtmlRenderer:
+    """Renders records as a self-contained HTML page with an attachment manifest"""
+    
+    extension = "html"
+    
+    def __init__(self, writer, channel_name: str):
+        self.writer = writer
+        self.channel_name = channel_name
+        self.manifest: List[dict] = []
+    
+    def start(self):
+        title = html.escape(f"Transcript for {self.channel_name}")
+        self.writer.write(
+            f"<!DOCTYPE html>\n<html lang=\"en\">\n<head>\n<meta charset=\"utf-8\">\n"
+            f"<title>{title}</title>\n<style>{HTML_STYLE}</style>\n</head>\n<body>\n"
+            f"<div class=\"header\"><h1>{title}</h1>"
+            f"<p>Generated by SereneEnterprise, all rights reserved (c) (Taken from Waterstone Academy)</p>"
+            f"<p>Generated on: {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')} UTC</p></div>\n"
+        )
+    
+    def render(self, records: List[dict]):
+        for record in records:
+            self.writer.write(self.format_record(record))
+    
+    def finish(self):
+        self.writer.write("<div class=\"header\"><h1>Attachment Manifest</h1></div>\n")
+        if not self.manifest:
+            self.writer.write("<p class=\"meta\">No attachments</p>\n")
+        else:
+            self.writer.write("<table><tr><th>Message</th><th>File</th><th>Size</th><th>SHA-256</th></tr>\n")
+            for entry in self.manifest:
+                self.writer.write(
+                    f"<tr><td><a href=\"#m{entry['message_id']}\">{entry['message_id']}</a></td>"
+                    f"<td><a href=\"{html.escape(entry['url'])}\">{html.escape(entry['filename'])}</a></td>"
+                    f"<td>{_format_size(entry['size'])}</td>"
+                    f"<td class=\"hash\">{entry.get('sha256') or 'Not archived'}</td></tr>\n"
+                )
+            self.writer.write("</table>\n")
+        self.writer.write("</body>\n</html>\n")
+    
+    @staticmethod
+    def format_text(text: str, mentions: Dict[str, str]) -> str:
+        """Escape message text and resolve mentions to names"""
+        parts = []
+        position = 0
+        for match in MENTION_PATTERN.finditer(text):
+            parts.append(html.escape(text[position:match.start()]))
+            kind, target_id = match.group(1).replace("!", ""), match.group(2)
+            name = mentions.get(f"{kind}{target_id}")
+            if name:
+                prefix = "#" if kind == "#" else "@"
+                parts.append(f"<span class=\"mention\">{prefix}{html.escape(name)}</span>")
+            else:
+                parts.append(html.escape(match.group(0)))
+            position = match.end()
+        parts.append(html.escape(text[position:]))
+        return "".join(parts)
+    
+    def format_record(self, record: dict) -> str:
+        """Format a single message record as an HTML block"""
+        mentions = record.get('mentions', {})
+        classes = "message deleted" if record.get('deleted') else "message"
+        
+        parts = [
+            f"<div class=\"{classes}\" id=\"m{record['id']}\">",
+            f"<span class=\"author\">{html.escape(record['author'])}</span>",
+            f"<span class=\"meta\">{record['timestamp']}</span>"
+        ]
+        if record.get('deleted'):
+            parts.append("<span class=\"tag\">DELETED</span>")
+        if record.get('edited_at'):
+            parts.append(f"<span class=\"tag\">EDITED {record['edited_at']}</span>")
+        elif record.get('edited'):
+            parts.append("<span class=\"tag\">EDITED</span>")
+        
+        if record['content']:
+            parts.append(f"<div class=\"content\">{self.format_text(record['content'], mentions)}</div>")
+        
+        # Earlier versions seen by the live log
+        revisions = record.get('revisions', [])
+        if revisions:
+            parts.append(f"<details><summary>{len(revisions)} earlier version(s)</summary>")
+            for revision in revisions:
+                parts.append(
+                    f"<div class=\"content\">{self.format_text(revision['content'] or '', mentions)}</div>"
+                )
+            parts.append("</details>")
+        
+        for embed in record['embeds']:
+            parts.append(self.format_embed(embed, mentions))
+        
+        for attachment in record['attachments']:
+            if not isinstance(attachment, dict):
+                parts.append(f"<div class=\"attachment\">{html.escape(attachment)}</div>")
+                continue
+            
+            self.manifest.append(dict(attachment, message_id=record['id']))
+            hash_text = attachment.get('sha256') or 'not archived'
+            parts.append(
+                f"<div class=\"attachment\"><a href=\"{html.escape(attachment['url'])}\">"
+                f"{html.escape(attachment['filename'])}</a> "
+                f"<span class=\"meta\">{_format_size(attachment['size'])}</span><br>"
+                f"<span class=\"hash\">sha256: {hash_text}</span></div>"
+            )
+        
+        parts.append("</div>\n")
+        return "".join(parts)
+    
+    def format_embed(self, embed: dict, mentions: Dict[str, str]) -> str:
+        """Format an embed record"""
+        colour = f"#{embed['color']:06x}" if embed.get('color') is not None else "#1e1f22"
+        parts = [f"<div class=\"embed\" style=\"border-left-color: {colour}\">"]
+        
+        if embed.get('title'):
+            title = html.escape(embed['title'])
+            if embed.get('url'):
+                title = f"<a href=\"{html.escape(embed['url'])}\">{title}</a>"
+            parts.append(f"<div class=\"embed-title\">{title}</div>")
+        if embed.get('description'):
+            parts.append(f"<div class=\"content\">{self.format_text(embed['description'], mentions)}</div>")
+        for field in embed.get('fields', []):
+            parts.append(
+                f"<div class=\"embed-field\"><div class=\"embed-field-name\">{html.escape(field['name'])}</div>"
+                f"<div class=\"content\">{self.format_text(field['value'], mentions)}</div></div>"
+            )
+        if embed.get('image'):
+            parts.append(f"<div><a href=\"{html.escape(embed['image'])}\">[Image]</a></div>")
+        if embed.get('footer'):
+            parts.append(f"<div class=\"meta\">{html.escape(embed['footer'])}</div>")
+        
+        parts.append("</div>")
+        return "".join(parts)
+
+
+RENDERERS = {
+    "text": TextRenderer,
+    "html": HtmlRenderer
+}